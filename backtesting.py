@@ -11,11 +11,17 @@ from fractions import Fraction
 import pandas as pd
 import os
 
-from functions.strategy import strategies
+from functions.load_data import load_data
+from functions.parallel import parallel_sweep
+from functions.profiling import profile
+from functions.resample import resampler
+from functions.result_store import result_store
+from functions.search import parameter_search
 from functions.visualization import visualization
 
-st = strategies()
 vi = visualization()
+ld = load_data()
+rs = resampler()
 
 # Prepare dataset
 coin = "BTC"
@@ -23,57 +29,81 @@ pair = f"{coin}USDT"
 endpoint = "https://api.glassnode.com/v1/metrics/distribution/balance_exchanges"
 data_name = endpoint.split('/')[-1]
 interval = "1h"
+base_interval = None # e.g. "1h" with interval = "4h": resample the 1h dataset instead of reading a 4h csv
 exchange = "binance"
 
 strategy_name = "bband"
 transaction_cost = 0.0006
 strategy = -1
+n_workers = mp.cpu_count() # number of processes sharing the sweep
+compact = False # int8 positions and float32 pnl for long minute-level histories (see strategies.compact_errors)
 
 z_threshes = np.array([0.0, 0.2, 0.4, 0.6, 0.8, 1.0, 1.2, 1.4, 1.6, 1.8, 2.0, 2.2, 2.4, 2.6, 2.8, 3.0])
 rolling_periods = np.array([24, 48, 96, 144, 192, 240, 360, 480, 600, 720, 840, 960, 1200, 1440, 1680, 1920, 2160, 2400])
 
-na = np.genfromtxt(f"cleaned_data/{pair}_{data_name}_price_{interval}.csv", delimiter=',', skip_header=1, dtype=str)
-test_set_0 = na[:, [0,1,2]]
-data_count = test_set_0.shape[0]
-test_sets = [test_set_0, test_set_0[ : int(data_count/3), :], test_set_0[int(data_count/3):int(2*data_count/3), :], test_set_0[int(2*data_count/3):, :]]
-
-# Test all test sets
-
-for test_no in range(len(test_sets)):
-    print(f"test set {test_no}")
-    test_set = test_sets[test_no]
-
-    sharpe_table = np.zeros((len(z_threshes), len(rolling_periods)))
-    calmar_table = np.zeros((len(z_threshes), len(rolling_periods)))
-    n_trade_table = np.zeros((len(z_threshes), len(rolling_periods)))
-    long_short_duration_ratio_table = np.zeros((len(z_threshes), len(rolling_periods)))
-
-    for i, z_thresh in enumerate(z_threshes):
-        for j, rolling_period in enumerate(rolling_periods):
-            # loop every combination of parameters
-            result = st.bband(test_set, transaction_cost, strategy, z_thresh, rolling_period, interval)
-            result_df = result[0] # pd.DataFrame for debugging
-            performance = result[1] # evaluation
-
-            sharpe_table[i, j] = performance["sharpe_ratio"]
-            calmar_table[i, j] = performance["calmar_ratio"]
-            n_trade_table[i, j] = performance["number_of_trades"]
-            long_short_duration_ratio_table[i, j] = performance["long_short_duration_ratio"]
-
-    # Generate Heatmaps
-    fig = vi.generate_heatmap(sharpe_table, calmar_table, 
-                                  n_trade_table, long_short_duration_ratio_table, 
-                                  rolling_periods, z_threshes, 
-                                  "rolling_periods", "z_threshes")
-
-    folder_path = "heatmaps"
-    file_name = f"test_{test_no}.png"
-    save_path = os.path.join(folder_path, file_name)
-
-    #Save the Heatmaps
-    fig.savefig(save_path, dpi=300)
-    
-    print(f"test {test_no} is finished")
+# "grid" evaluates every cell above. "refine" searches the fine grid below coarse-to-fine (functions/search.py):
+# a coarse pass, then finer passes around the best cells by search_metric, a few percent of the cells in all.
+search_mode = "grid"
+fine_z_threshes = np.round(np.arange(0.0, 3.0001, 0.05), 2)
+fine_rolling_periods = np.arange(24, 2401, 24)
+search_metric = "sharpe_ratio"
+
+if __name__ == "__main__":
+    # Set BACKTEST_PROFILE=1 for a per-stage timing summary at the end (BACKTEST_PROFILE_OUTPUT=<path> adds cProfile stats)
+    profile.start()
+
+    # columns: epoch milliseconds, price, variable (parsed once into /cache, memory-mapped afterwards)
+    if base_interval is None:
+        na = ld.load_array(f"cleaned_data/{pair}_{data_name}_price_{interval}.csv")
+    else:
+        na = rs.load_array(f"cleaned_data/{pair}_{data_name}_price_{base_interval}.csv", base_interval, interval)
+    test_set_0 = na[:, [0,1,2]]
+    data_count = test_set_0.shape[0]
+    test_ranges = [(0, data_count), (0, int(data_count/3)), (int(data_count/3), int(2*data_count/3)), (int(2*data_count/3), data_count)]
+
+    # Test all test sets, spreading every (test set, rolling period) pair across the worker processes.
+    # Cells already in /results are read back instead of recomputed; finished columns are saved as they arrive,
+    # so an interrupted run resumes and an extra rolling period only costs its own column.
+    sweep = parallel_sweep(n_workers, compact)
+    store = result_store()
+    with profile.stage("sweep"):
+        if search_mode == "refine":
+            z_threshes, rolling_periods = fine_z_threshes, fine_rolling_periods
+            search = parameter_search(sweep, store, metric=search_metric)
+            all_tables, _ = search.run(strategy_name, test_set_0, test_ranges, transaction_cost, strategy, z_threshes, rolling_periods, interval)
+            for test_no, tables in enumerate(all_tables):
+                best = search.best(tables, z_threshes, rolling_periods)
+                print(f"test {test_no} best: z_thresh {best['row_param']}, rolling_period {best['col_param']}, {search_metric} {best[search_metric]:.3f}")
+        else:
+            all_tables = store.sweep(sweep, strategy_name, test_set_0, test_ranges, transaction_cost, strategy, z_threshes, rolling_periods, interval)
+
+    heatmap_jobs = []
+    for test_no in range(len(test_ranges)):
+        tables = all_tables[test_no]
+
+        sharpe_table = tables["sharpe_ratio"]
+        calmar_table = tables["calmar_ratio"]
+        n_trade_table = tables["number_of_trades"]
+        long_short_duration_ratio_table = tables["long_short_duration_ratio"]
+
+        folder_path = "heatmaps"
+        file_name = f"test_{test_no}.png"
+        save_path = os.path.join(folder_path, file_name)
+
+        heatmap_jobs.append({
+            "tables": (sharpe_table, calmar_table, n_trade_table, long_short_duration_ratio_table),
+            "xticklabels": vi.tick_labels(rolling_periods),
+            "yticklabels": vi.tick_labels(z_threshes),
+            "xlabel": "rolling_periods",
+            "ylabel": "z_threshes",
+            "save_path": save_path,
+            "dpi": 300
+            })
+
+    # Generate and save the Heatmaps of all test sets in parallel worker processes
+    vi.save_heatmaps(heatmap_jobs, n_workers)
+    for test_no in range(len(test_ranges)):
+        print(f"test {test_no} is finished")
     print(f"heatmaps can be found in /{folder_path}")
 
-
+    profile.finish()
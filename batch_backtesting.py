@@ -0,0 +1,21 @@
+# Batch_backtesting.py
+# Purpose: Back-test a whole matrix of pairs, metrics, intervals and strategies in one run.
+# Usage: python batch_backtesting.py [spec.json] (default: batch_spec.json)
+# After execution, heatmaps and tables of every combination can be found in /batch_results,
+# together with summary.csv covering all of them.
+
+import json
+import sys
+
+from functions.batch_runner import batch_runner
+
+if __name__ == "__main__":
+    spec_path = sys.argv[1] if len(sys.argv) > 1 else "batch_spec.json"
+    with open(spec_path) as f:
+        spec = json.load(f)
+
+    runner = batch_runner(spec.get("n_workers"), spec.get("output_folder", "batch_results"))
+    summary = runner.run(spec)
+
+    print(f"{summary.groupby(['pair', 'metric', 'interval', 'strategy_name']).ngroups if len(summary) else 0} combinations finished")
+    print(f"results can be found in /{runner.output_folder}")
@@ -0,0 +1,59 @@
+# Benchmark.py
+# Purpose: Time the strategy kernels, grid sweeps and data loading on synthetic 1h, 5m and 1m data.
+# Run it before and after a change: save a baseline first, later runs are compared against it and
+# the script exits with status 1 when a case got slower, bigger or produced a different result.
+#   python benchmark.py --save-baseline   # record benchmark_results/baseline.json
+#   python benchmark.py                   # compare against it
+# Timings are machine-specific, so only compare against a baseline saved on the same machine.
+
+import numpy as np
+import argparse
+import sys
+
+from functions.benchmark import benchmark
+
+# Synthetic dataset sizes (bars): about 4 years of 1h, 1 year of 5m and 1 year of 1m
+sizes = {"1h": 24 * 365 * 4, "5m": 12 * 24 * 365, "1m": 60 * 24 * 365}
+
+# Sweep grid; rolling windows are in hours and scaled to bars for every interval
+z_threshes = np.array([0.0, 0.4, 0.8, 1.2, 1.6, 2.0, 2.4, 2.8])
+rolling_hours = [24, 96, 240, 720, 1680]
+
+tolerance = 0.25 # allowed slowdown (fraction) before a case counts as a regression
+memory_tolerance = 0.25 # allowed peak memory growth (fraction)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save-baseline", action="store_true", help="save this run as the baseline")
+    parser.add_argument("--baseline", default="benchmark_results/baseline.json")
+    parser.add_argument("--output", default="benchmark_results/latest.json")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="also time parallel_sweep with this many processes")
+    parser.add_argument("--quick", action="store_true", help="only the 1h size")
+    args = parser.parse_args()
+
+    bench = benchmark(repeats=args.repeats)
+    run_sizes = {"1h": sizes["1h"]} if args.quick else sizes
+    results = bench.run(run_sizes, z_threshes, rolling_hours, n_workers=args.workers)
+    bench.save(results, args.output)
+
+    if args.save_baseline:
+        bench.save(results, args.baseline)
+        print(f"baseline saved to {args.baseline}")
+        sys.exit(0)
+
+    try:
+        baseline = bench.load(args.baseline)
+    except FileNotFoundError:
+        print(f"no baseline at {args.baseline}, run with --save-baseline first")
+        sys.exit(0)
+
+    regressions = bench.compare(results, baseline, tolerance, memory_tolerance)
+    if regressions:
+        print("***************************************************************************************")
+        print("regressions against the baseline:")
+        for regression in regressions:
+            print(regression)
+        print("***************************************************************************************")
+        sys.exit(1)
+    print(f"no regressions against {args.baseline}")
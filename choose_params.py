@@ -11,11 +11,17 @@ from fractions import Fraction
 import pandas as pd
 import os
 
+from functions.load_data import load_data
+from functions.evaluation import evaluation
+from functions.result_store import result_store
+from functions.robustness import robustness
 from functions.strategy import strategies
 from functions.visualization import visualization
 
 st = strategies()
+evaluate = evaluation()
 vi = visualization()
+ld = load_data()
 
 # Prepare dataset
 coin = "BTC"
@@ -32,17 +38,35 @@ strategy = -1
 z_thresh = 1.8
 rolling_period = 1680
 test_no = 0
+use_best_stored = False # take the best stored parameters of backtesting.py instead of the ones above
+best_by = "sharpe_ratio"
+n_resamples = 10000 # block bootstrap and random-entry resamples of the chosen run (0 to skip)
 
-na = np.genfromtxt(f"cleaned_data/{pair}_{data_name}_price_{interval}.csv", delimiter=',', skip_header=1, dtype=str)
+# columns: epoch milliseconds, price, variable
+na = ld.load_array(f"cleaned_data/{pair}_{data_name}_price_{interval}.csv")
 test_set_0 = na[:, [0,1,2]]
 data_count = test_set_0.shape[0]
 test_sets = [test_set_0, test_set_0[ : int(data_count/3), :], test_set_0[int(data_count/3):int(2*data_count/3), :], test_set_0[int(2*data_count/3):, :]]
 test_set = test_sets[test_no]
 
+# Look up the sweep results of backtesting.py for this test set
+store = result_store()
+dataset_hash = store.dataset_hash(test_set)
+if use_best_stored:
+    best = store.best(dataset_hash, strategy_name, transaction_cost, strategy, best_by)
+    if best is None:
+        print("no stored results for this test set, run backtesting.py first")
+    else:
+        z_thresh, rolling_period = best["row_param"], int(best["col_param"])
+stored, missing = store.get(dataset_hash, strategy_name, transaction_cost, strategy, np.array([z_thresh]), np.array([rolling_period]))
+
 # Perform BBand
 result = st.bband(test_set, transaction_cost, strategy, z_thresh, rolling_period, interval)
 result_df = result[0] # pd.DataFrame for debugging
 performance = result[1] # evaluation
+if not missing[0, 0]:
+    print(f"metrics of z_thresh = {z_thresh}, rolling_period = {rolling_period} read from {store.path}")
+    performance = {key: values[0, 0] for key, values in stored.items()}
 
 result_df.to_csv("csv_debug/result.csv")
 
@@ -60,6 +84,17 @@ print(f"long_short_duration_ratio: {str(round(performance["long_short_duration_r
 print(f"acc_return: {str(round(result_df["cum_pnl"][len(result_df)-1] * 100, 2))}%")
 print("***************************************************************************************")
 
+# Is it luck? 95% bootstrap intervals of the metrics, and how often randomly timed entries with the same positions do as well
+if n_resamples:
+    rb = robustness(n_resamples)
+    day_starts = evaluate.day_starts(result_df["timestamps"].to_numpy())
+    intervals = rb.bootstrap(result_df["pnl"].to_numpy(), day_starts)
+    random_entries = rb.permutation_test(result_df["positions"].to_numpy(), result_df["pct_changes"].to_numpy(), transaction_cost, day_starts)
+    for metric in intervals:
+        ci, test = intervals[metric], random_entries[metric]
+        print(f"{metric}: {ci['observed']:.3f}, 95% CI [{ci['lower']:.3f}, {ci['upper']:.3f}], random-entry p-value {test['p_value']:.4f}")
+    print("***************************************************************************************")
+
 
 title = f"{pair} {data_name} {strategy_name} ({interval} data) (z_thresh = {z_thresh}, rolling_period = {rolling_period})"
 
@@ -0,0 +1,81 @@
+# Cost_sensitivity.py
+# Purpose: How do the backtest results change with trading costs?
+# Every parameter cell is evaluated for a whole range of fee levels (plus volume-based slippage) in one pass.
+# After execution, one heatmap per fee level can be found in /cost_sensitivity, with cost_surface.csv next to them.
+
+import numpy as np
+import pandas as pd
+import os
+
+from functions.accounting import accounting
+from functions.load_data import load_data
+from functions.strategy import strategies
+from functions.visualization import visualization
+
+st = strategies()
+ac = accounting()
+vi = visualization()
+ld = load_data()
+
+# Prepare dataset
+coin = "BTC"
+pair = f"{coin}USDT"
+endpoint = "https://api.glassnode.com/v1/metrics/distribution/balance_exchanges"
+data_name = endpoint.split('/')[-1]
+interval = "1h"
+
+strategy_name = "bband"
+strategy = -1
+transaction_costs = np.array([0.0, 0.0002, 0.0004, 0.0006, 0.0008, 0.001, 0.0015, 0.002]) # fee per unit traded
+
+z_threshes = np.array([0.0, 0.2, 0.4, 0.6, 0.8, 1.0, 1.2, 1.4, 1.6, 1.8, 2.0, 2.2, 2.4, 2.6, 2.8, 3.0])
+rolling_periods = np.array([24, 48, 96, 144, 192, 240, 360, 480, 600, 720, 840, 960, 1200, 1440, 1680, 1920, 2160, 2400])
+
+# Slippage on top of every fee: impact * sqrt(order size / bar quote volume), from the volume column of the cleaned data
+# (re-run data_preparation.py with incremental = False if the cleaned csv has no volume column yet)
+use_slippage = True
+order_size = 100000 # quote currency (USDT) per unit of position
+impact = 0.1
+max_slippage = 0.01
+
+na = ld.load_array(f"cleaned_data/{pair}_{data_name}_price_{interval}.csv")
+columns = ld.load_cleaned(f"cleaned_data/{pair}_{data_name}_price_{interval}.csv")[2]
+slippage = None
+if use_slippage:
+    if "volume" in columns:
+        slippage = ac.volume_slippage(na[:, 1], na[:, columns.index("volume")], order_size, impact, max_slippage)
+    else:
+        print("no volume column in the cleaned data, fees only")
+
+tables = st.cost_grid(strategy_name, na[:, [0,1,2]], transaction_costs, strategy, z_threshes, rolling_periods, interval, slippage)
+
+# Show how the best cell and the share of good cells decay with costs
+folder_path = "cost_sensitivity"
+os.makedirs(folder_path, exist_ok=True)
+print("***************************************************************************************")
+if slippage is not None:
+    print(f"slippage: median {np.median(slippage) * 10000:.2f} bps per unit traded ({order_size} {pair[len(coin):]} orders)")
+heatmap_jobs, rows = [], []
+for k, transaction_cost in enumerate(transaction_costs):
+    sharpe_table = tables["sharpe_ratio"][k]
+    i, j = np.unravel_index(np.nanargmax(sharpe_table), sharpe_table.shape)
+    print(f"fee {transaction_cost * 10000:.0f} bps: best sharpe {sharpe_table[i, j]:.2f} (z_thresh = {z_threshes[i]}, rolling_period = {rolling_periods[j]}), "
+          f"{np.mean(sharpe_table > 1):.0%} of cells above 1")
+    heatmap_jobs.append({
+        "tables": tuple(tables[key][k] for key in ["sharpe_ratio", "calmar_ratio", "number_of_trades", "long_short_duration_ratio"]),
+        "xticklabels": vi.tick_labels(rolling_periods),
+        "yticklabels": vi.tick_labels(z_threshes),
+        "xlabel": "rolling_periods",
+        "ylabel": "z_threshes",
+        "save_path": os.path.join(folder_path, f"fee_{transaction_cost * 10000:g}bps.png"),
+        "dpi": 300
+        })
+    for i, z_thresh in enumerate(z_threshes):
+        for j, rolling_period in enumerate(rolling_periods):
+            rows.append(dict({"transaction_cost": transaction_cost, "z_thresh": z_thresh, "rolling_period": rolling_period},
+                             **{key: values[k, i, j] for key, values in tables.items()}))
+print("***************************************************************************************")
+
+pd.DataFrame(rows).to_csv(os.path.join(folder_path, "cost_surface.csv"), index=False)
+vi.save_heatmaps(heatmap_jobs)
+print(f"heatmaps and cost_surface.csv can be found in /{folder_path}")
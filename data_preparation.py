@@ -1,9 +1,14 @@
 from functions.fetch_data import fetch_data
+from functions.load_data import load_data
+from functions.resample import resampler
 from datetime import datetime
 import pytz
 import pandas as pd
+import os
 
 fd = fetch_data()
+ld = load_data()
+rs = resampler()
 
 # Information
 coin = "BTC"
@@ -15,20 +20,59 @@ utc_tz = pytz.timezone('UTC')
 startTime = datetime(2021, 1, 1, tzinfo=utc_tz)
 endTime = datetime.now(utc_tz)
 exchange = "binance"
+epoch_ms = True # keep timestamps as int64 epoch milliseconds; they are only formatted when plotting
+incremental = True # only fetch what is missing after the last stored row and append it; False refetches everything
+# Coarser intervals are resampled from this dataset into /cache instead of being downloaded (functions/resample.py);
+# backtesting.py and batch_backtesting.py read them through base_interval
+resample_intervals = ["4h", "1d"]
 
-# Fetch exchange balance data from Glassnode API
-exchange_balance_df = fd.get_data_from_glassnode(coin, endpoint, interval, startTime, endTime, exchange)
-exchange_balance_df = exchange_balance_df.rename(columns={"value": data_name})
-exchange_balance_df.to_csv(f"raw_data/{coin}_{data_name}_{interval}.csv", index = False)
+balance_path = f"raw_data/{coin}_{data_name}_{interval}.csv"
+price_path = f"raw_data/{pair}_price_{interval}.csv"
+cleaned_path = f"cleaned_data/{pair}_{data_name}_price_{interval}.csv"
 
-# Fetch pair price data from Binance API
-price_df = fd.get_price(pair, endpoint, interval, startTime, endTime)
-price_df.to_csv(f"raw_data/{pair}_price_{interval}.csv", index = False)
+if incremental:
+    # Each series resumes from the earlier of its own last row and the cleaned dataset's last row,
+    # so bars that were fetched before but not yet merged are merged now. Overlapping rows are deduped on append.
+    # New rows are appended in whatever timestamp format the stored files already use.
+    balance_start = ld.resume_time([balance_path, cleaned_path], startTime)
+    price_start = ld.resume_time([price_path, cleaned_path], startTime)
 
-# Prepare cleaned dataset
-price_df = price_df.rename(columns={"open time": "time", "open": "price"})
-merged_df = pd.merge(price_df, exchange_balance_df, on="time", how="inner")
-final_df = merged_df[['time', 'price', data_name]]
+    exchange_balance_df = fd.get_data_from_glassnode(coin, endpoint, interval, balance_start, endTime, exchange, epoch_ms=True)
+    exchange_balance_df = exchange_balance_df.rename(columns={"value": data_name})
+    print(f"{ld.append_csv(balance_path, exchange_balance_df, ['time'])} new rows in {balance_path}")
 
-# Save the cleaned dataset
-final_df.to_csv(f"cleaned_data/{pair}_{data_name}_price_{interval}.csv", index = False)
+    price_df = fd.get_price(pair, endpoint, interval, price_start, endTime, epoch_ms=True)
+    price_df = price_df[price_df["close time"] < int(endTime.timestamp() * 1000)] # only closed klines
+    print(f"{ld.append_csv(price_path, price_df, ['open time', 'close time'])} new rows in {price_path}")
+
+    price_df = price_df.rename(columns={"open time": "time", "open": "price"})
+    merged_df = pd.merge(price_df, exchange_balance_df, on="time", how="inner")
+    final_df = merged_df[['time', 'price', data_name, 'volume']] # volume (base asset) feeds the slippage model of cost_sensitivity.py
+    if os.path.exists(cleaned_path) and os.path.getsize(cleaned_path) > 0:
+        dropped = [column for column in final_df.columns if column not in pd.read_csv(cleaned_path, nrows=0).columns]
+        if dropped:
+            print(f"warning: {cleaned_path} has no {', '.join(dropped)} column, so it is not appended; "
+                  f"run once with incremental = False to rebuild the file with it")
+    print(f"{ld.append_csv(cleaned_path, final_df, ['time'])} new rows in {cleaned_path}")
+
+else:
+    # Fetch exchange balance data from Glassnode API
+    exchange_balance_df = fd.get_data_from_glassnode(coin, endpoint, interval, startTime, endTime, exchange, epoch_ms=epoch_ms)
+    exchange_balance_df = exchange_balance_df.rename(columns={"value": data_name})
+    exchange_balance_df.to_csv(balance_path, index = False)
+
+    # Fetch pair price data from Binance API
+    price_df = fd.get_price(pair, endpoint, interval, startTime, endTime, epoch_ms=epoch_ms)
+    price_df.to_csv(price_path, index = False)
+
+    # Prepare cleaned dataset
+    price_df = price_df.rename(columns={"open time": "time", "open": "price"})
+    merged_df = pd.merge(price_df, exchange_balance_df, on="time", how="inner")
+    final_df = merged_df[['time', 'price', data_name, 'volume']] # volume (base asset) feeds the slippage model of cost_sensitivity.py
+
+    # Save the cleaned dataset
+    final_df.to_csv(cleaned_path, index = False)
+
+# Build the coarser bars once from the cleaned dataset
+for resampled_interval, (timestamps, _) in rs.build(cleaned_path, interval, resample_intervals).items():
+    print(f"{len(timestamps)} {resampled_interval} bars resampled from {cleaned_path}")
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+from functions.evaluation import evaluation
+from functions.profiling import profile
+
+evaluate = evaluation()
+
+class accounting:
+    # Shared position -> pnl -> metrics engine of every strategy.
+    # Positions are one vector (1D, a single parameter set) or a stack of vectors (2D, one row per parameter set)
+    # over the same bars. The position decided on a bar is held over the next bar's return and every position
+    # change pays transaction_cost on its size.
+    #
+    # compact=True keeps the per-bar series small for long minute-level histories: positions, previous positions
+    # and trades are int8 (so positions must be integers with |position| <= 63), returns, costs and pnl float32.
+    # Cumulative sums, daily sums and metrics still accumulate in float64 (evaluation), and signals still decide
+    # positions on float64 indicators, so only pnl rounding differs; see strategies.compact_errors.
+
+    def __init__(self, compact: bool = False):
+        self.compact = compact
+
+    def pct_changes(self, prices: np.ndarray) -> np.ndarray:
+        # Bar returns of the asset; the first bar has no previous price
+        pct_changes = np.concatenate((np.array([0]), np.diff(prices) / prices[:-1]))
+        return pct_changes.astype(np.float32) if self.compact else pct_changes
+
+    def window_pct_changes(self, pct_changes_full: np.ndarray, warm_up: int) -> np.ndarray:
+        # Same values as pct_changes(prices[warm_up:]), sliced from the returns of the full series
+        pct_changes = pct_changes_full[warm_up:].copy()
+        pct_changes[0] = 0
+        return pct_changes
+
+    def ledger(self, positions: np.ndarray, pct_changes: np.ndarray, transaction_cost: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # (prev_positions, trades, costs, pnl) with the shape of positions
+        with profile.stage("accounting.ledger") as stage:
+            if self.compact:
+                positions = self.compact_positions(positions)
+                prev_positions = np.zeros(positions.shape, dtype=np.int8)
+                prev_positions[..., 1:] = positions[..., :-1]
+                trades = positions - prev_positions
+                costs = np.abs(trades).astype(np.float32) * np.float32(transaction_cost)
+            else:
+                prev_positions = np.zeros(np.shape(positions), dtype=float)
+                prev_positions[..., 1:] = positions[..., :-1]
+                trades = positions - prev_positions
+                costs = np.abs(trades) * transaction_cost
+            pnl = prev_positions * pct_changes - costs
+            stage.allocated(prev_positions, trades, costs, pnl)
+        return prev_positions, trades, costs, pnl
+
+    def compact_positions(self, positions: np.ndarray) -> np.ndarray:
+        # int8 copy of integer positions; anything int8 cannot hold exactly (or whose trades would overflow) is an error
+        positions = np.asarray(positions)
+        if positions.dtype == np.int8:
+            return positions
+        compact = positions.astype(np.int8)
+        if not np.array_equal(compact, positions) or np.any(np.abs(compact) > 63):
+            raise ValueError("compact mode needs integer positions between -63 and 63")
+        return compact
+
+    def metrics(self, positions: np.ndarray, pct_changes: np.ndarray, transaction_cost: float, day_starts: np.ndarray) -> Dict:
+        # Every evaluation metric of one (1D) or many (2D) position vectors; see evaluation.compute_metrics
+        if self.compact:
+            positions = self.compact_positions(positions)
+        _, _, _, pnl = self.ledger(positions, pct_changes, transaction_cost)
+        with profile.stage("accounting.metrics"):
+            return evaluate.compute_metrics(pnl, pct_changes, positions, day_starts)
+
+    def cost_metrics(self, positions: np.ndarray, pct_changes: np.ndarray, transaction_costs: np.ndarray, day_starts: np.ndarray,
+                     slippage: np.ndarray = None) -> Dict[str, np.ndarray]:
+        # metrics() of a 2D position stack for a whole vector of fee levels at once, optionally plus a per-bar
+        # slippage rate (see volume_slippage) paid on every traded unit. Positions do not depend on costs, so the
+        # gross pnl, turnover and their daily sums are computed once, and the daily pnl of every fee level is a
+        # linear combination of them. Running sums are linear too, so only the running peak of the drawdowns needs
+        # a pass over the bars per fee level (see _cost_drawdowns).
+        # Returns one (len(transaction_costs), rows) array per metric.
+        positions = np.atleast_2d(positions)
+        with profile.stage("accounting.cost_ledger") as stage:
+            prev_positions = np.zeros(positions.shape, dtype=float)
+            prev_positions[:, 1:] = positions[:, :-1]
+            turnover = np.abs(positions - prev_positions)
+            gross_pnl = prev_positions * pct_changes
+            fixed_costs = np.zeros(1) if slippage is None else turnover * slippage
+            stage.allocated(prev_positions, turnover, gross_pnl, fixed_costs)
+
+        with profile.stage("accounting.cost_metrics"):
+            daily_gross_pnl = evaluate.daily_sum(gross_pnl, day_starts)
+            daily_turnover = evaluate.daily_sum(turnover, day_starts)
+            daily_fixed_costs = 0 if slippage is None else evaluate.daily_sum(fixed_costs, day_starts)
+            asset_daily_pct_change = evaluate.daily_sum(np.atleast_2d(pct_changes), day_starts)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                long_short_duration_ratio = np.sum(positions > 0, axis=1) / np.sum(positions < 0, axis=1)
+            number_of_trades = np.count_nonzero(turnover, axis=1)
+
+            metrics = {key: np.empty((len(transaction_costs), len(positions)))
+                       for key in ["sharpe_ratio", "calmar_ratio", "beta", "maximum_drawdown", "long_short_duration_ratio", "number_of_trades"]}
+            maximum_drawdowns = self._cost_drawdowns(gross_pnl - fixed_costs, turnover, transaction_costs)
+            for k, transaction_cost in enumerate(transaction_costs):
+                strategy_daily_pnl = daily_gross_pnl - daily_turnover * transaction_cost - daily_fixed_costs
+                maximum_drawdown = maximum_drawdowns[k]
+                metrics["sharpe_ratio"][k], metrics["calmar_ratio"][k] = evaluate.compute_ratios(strategy_daily_pnl, maximum_drawdown)
+                metrics["beta"][k] = evaluate.compute_betas(strategy_daily_pnl, asset_daily_pct_change)
+                metrics["maximum_drawdown"][k] = maximum_drawdown
+                metrics["long_short_duration_ratio"][k] = long_short_duration_ratio
+                metrics["number_of_trades"][k] = number_of_trades
+        return metrics
+
+    def _cost_drawdowns(self, net_pnl: np.ndarray, turnover: np.ndarray, transaction_costs: np.ndarray,
+                        max_elements: int = 4_000_000) -> np.ndarray:
+        # Maximum drawdown of net_pnl - turnover * cost for every cost, shape (costs, rows). The running pnl of a cost
+        # is cumsum(net_pnl) - cost * cumsum(turnover), built in reused buffers, a chunk of rows at a time.
+        maximum_drawdowns = np.empty((len(transaction_costs), len(net_pnl)))
+        rows_per_chunk = max(1, max_elements // max(net_pnl.shape[1], 1))
+        for start in range(0, len(net_pnl), rows_per_chunk):
+            rows = slice(start, start + rows_per_chunk)
+            cum_net_pnl = np.cumsum(net_pnl[rows], axis=1, dtype=np.float64)
+            cum_turnover = np.cumsum(turnover[rows], axis=1, dtype=np.float64)
+            cum_pnl, peak = np.empty(cum_net_pnl.shape), np.empty(cum_net_pnl.shape)
+            for k, transaction_cost in enumerate(transaction_costs):
+                np.multiply(cum_turnover, -transaction_cost, out=cum_pnl)
+                cum_pnl += cum_net_pnl
+                np.maximum.accumulate(cum_pnl, axis=1, out=peak)
+                np.subtract(cum_pnl, peak, out=peak)
+                maximum_drawdowns[k, rows] = peak.min(axis=1)
+        return maximum_drawdowns
+
+    def volume_slippage(self, prices: np.ndarray, volumes: np.ndarray, notional: float, impact: float = 0.1,
+                        max_slippage: float = 0.01) -> np.ndarray:
+        # Per-bar slippage rate of trading `notional` (quote currency) on a bar with `volumes` base asset traded:
+        # the square-root impact model, impact * sqrt(notional / bar quote volume), capped at max_slippage
+        # (also used for bars without volume)
+        quote_volumes = np.asarray(prices, dtype=float) * np.asarray(volumes, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slippage = impact * np.sqrt(notional / quote_volumes)
+        return np.where(quote_volumes > 0, np.minimum(slippage, max_slippage), max_slippage)
+
+    def frame(self, timestamps: np.ndarray, prices: np.ndarray, variables: np.ndarray, series: Dict[str, np.ndarray],
+              positions: np.ndarray, pct_changes: np.ndarray, transaction_cost: float) -> pd.DataFrame:
+        # Per-bar debugging DataFrame of a single run: inputs, the strategy's own series (indicators, bands),
+        # then positions, trades, costs, pnl and drawdowns next to buy-and-hold
+        with profile.stage("accounting.frame") as stage:
+            prev_positions, trades, costs, pnl = self.ledger(positions, pct_changes, transaction_cost)
+            price_changes = np.concatenate((np.array([0]), np.diff(prices)))
+            earnings = prev_positions * price_changes - costs * prices
+            cum_pnl = np.cumsum(pnl, dtype=np.float64)
+            drawdowns = cum_pnl - np.maximum.accumulate(cum_pnl)
+            underlying_cumu = np.cumsum(pct_changes, dtype=np.float64)
+            underlying_dd = underlying_cumu - np.maximum.accumulate(underlying_cumu)
+
+            if timestamps.dtype.kind == "f":
+                timestamps = timestamps.astype(np.int64) # epoch milliseconds from load_data, formatted only when plotting
+
+            df = pd.DataFrame(dict(
+                {'timestamps': timestamps, 'prices': prices, 'variables': variables},
+                **series,
+                positions=positions,
+                pct_changes=pct_changes,
+                price_changes=price_changes,
+                trades=trades,
+                costs=costs,
+                earnings=earnings,
+                pnl=pnl,
+                cum_pnl=cum_pnl,
+                drawdowns=drawdowns,
+                underlying_cumu=underlying_cumu,
+                underlying_dd=underlying_dd
+                ))
+            stage.allocated(df)
+        return df
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import itertools
+import os
+from typing import Dict, List, Tuple
+from functions.load_data import load_data
+from functions.parallel import parallel_sweep
+from functions.resample import resampler
+from functions.strategy import strategies
+from functions.visualization import visualization
+
+ld = load_data()
+vi = visualization()
+st = strategies()
+rs = resampler()
+
+class batch_runner:
+    # Backtest a matrix of (pair, metric, interval, strategy, grid) combinations in one process pool.
+    # Every dataset is loaded once and stacked into a single shared-memory array; each combination is
+    # swept over the full dataset and its thirds like backtesting.py, and writes heatmaps plus a summary table.
+
+    def __init__(self, n_workers: int = None, output_folder: str = "batch_results"):
+        self.n_workers = n_workers
+        self.output_folder = output_folder
+
+    def expand(self, spec: Dict) -> List[Dict]:
+        # A spec lists explicit "runs" and/or a "matrix" of pairs x metrics x intervals x strategies.
+        # Intervals without a cleaned CSV are resampled from the spec's "base_interval" dataset, if given.
+        # Each strategy entry is {"strategy_name", "strategy", "rows", "cols"}
+        # (rows/cols: z_threshes/rolling_periods for bband, shorter/longer periods for SMA_cross).
+        defaults = {"transaction_cost": spec.get("transaction_cost", 0.0006)}
+        runs = [dict(defaults, **run) for run in spec.get("runs", [])]
+        matrix = spec.get("matrix")
+        if matrix:
+            for pair, metric, interval, strategy in itertools.product(matrix["pairs"], matrix["metrics"], matrix["intervals"], matrix["strategies"]):
+                runs.append(dict(defaults, pair=pair, metric=metric, interval=interval, **strategy))
+        return runs
+
+    def dataset_path(self, run: Dict, interval: str = None) -> str:
+        data_name = run["metric"].split('/')[-1]
+        return f"cleaned_data/{run['pair']}_{data_name}_price_{interval or run['interval']}.csv"
+
+    def load(self, run: Dict, base_interval: str = None) -> np.ndarray:
+        # The run's cleaned dataset, or its bars resampled from the base_interval dataset when the interval
+        # has no cleaned CSV of its own (see functions/resample.py); None if neither exists
+        path = self.dataset_path(run)
+        if os.path.exists(path):
+            return ld.load_array(path)
+        if base_interval is not None and os.path.exists(self.dataset_path(run, base_interval)):
+            return rs.load_array(self.dataset_path(run, base_interval), base_interval, run["interval"])
+        return None
+
+    def run(self, spec: Dict) -> pd.DataFrame:
+        runs = self.expand(spec)
+
+        # load every distinct dataset once and stack them; jobs address their dataset by row offsets
+        datasets, offsets, arrays, total = {}, {}, [], 0
+        for run in runs:
+            path = self.dataset_path(run)
+            if path in datasets:
+                continue
+            numpy_array = self.load(run, spec.get("base_interval"))
+            if numpy_array is None:
+                print(f"{path} not found, skipping (run data_preparation.py for it first)")
+                datasets[path] = None
+                continue
+            datasets[path] = numpy_array[:, :3]
+            offsets[path] = total
+            arrays.append(datasets[path])
+            total += len(datasets[path])
+        runs = [run for run in runs if datasets[self.dataset_path(run)] is not None]
+        if not runs:
+            return pd.DataFrame()
+
+        jobs, job_owner = [], []
+        for run_no, run in enumerate(runs):
+            offset = offsets[self.dataset_path(run)]
+            data_count = len(datasets[self.dataset_path(run)])
+            test_ranges = [(0, data_count), (0, int(data_count/3)), (int(data_count/3), int(2*data_count/3)), (int(2*data_count/3), data_count)]
+            for test_no, (start, stop) in enumerate(test_ranges):
+                jobs.append((offset + start, offset + stop, run["strategy_name"], run["transaction_cost"], run["strategy"],
+                             np.array(run["rows"]), np.array(run["cols"]), run["interval"]))
+                job_owner.append((run_no, test_no))
+
+        results = parallel_sweep(self.n_workers).run_jobs(np.concatenate(arrays), jobs)
+
+        summaries, heatmap_jobs = [], []
+        for (run_no, test_no), tables in zip(job_owner, results):
+            summary, heatmap_job = self._write(runs[run_no], test_no, tables)
+            summaries.append(summary)
+            heatmap_jobs.append(heatmap_job)
+        vi.save_heatmaps(heatmap_jobs, self.n_workers)
+        summary = pd.concat(summaries, ignore_index=True)
+        os.makedirs(self.output_folder, exist_ok=True)
+        summary.to_csv(os.path.join(self.output_folder, "summary.csv"), index=False)
+        return summary
+
+    def _write(self, run: Dict, test_no: int, tables: Dict[str, np.ndarray]) -> Tuple[pd.DataFrame, Dict]:
+        # long-form table of one combination and test set, and the job rendering its heatmaps
+        data_name = run["metric"].split('/')[-1]
+        folder_path = os.path.join(self.output_folder, f"{run['pair']}_{data_name}_{run['interval']}_{run['strategy_name']}")
+        os.makedirs(folder_path, exist_ok=True)
+        rows, cols = np.array(run["rows"]), np.array(run["cols"])
+        strategy_signal = st.signal(run["strategy_name"])
+        row_label, col_label = strategy_signal.row_label(), strategy_signal.col_label()
+
+        heatmap_job = {
+            "tables": (tables["sharpe_ratio"], tables["calmar_ratio"], tables["number_of_trades"], tables["long_short_duration_ratio"]),
+            "xticklabels": cols,
+            "yticklabels": rows,
+            "xlabel": col_label,
+            "ylabel": row_label,
+            "save_path": os.path.join(folder_path, f"test_{test_no}.png"),
+            "dpi": 300
+            }
+
+        row_index, col_index = np.meshgrid(np.arange(len(rows)), np.arange(len(cols)), indexing="ij")
+        df = pd.DataFrame({
+            "pair": run["pair"],
+            "metric": data_name,
+            "interval": run["interval"],
+            "strategy_name": run["strategy_name"],
+            "test_no": test_no,
+            "row_label": row_label,
+            "col_label": col_label,
+            "row_param": rows[row_index.ravel()],
+            "col_param": cols[col_index.ravel()],
+            })
+        for key, values in tables.items():
+            df[key] = values.ravel()
+        # generic parameter columns so strategies line up in summary.csv; the combination's own table names them
+        df.drop(columns=["row_label", "col_label"]).rename(columns={"row_param": row_label, "col_param": col_label}).to_csv(
+            os.path.join(folder_path, f"test_{test_no}.csv"), index=False)
+        return df, heatmap_job
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+import shutil
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from functions.evaluation import evaluation
+from functions.load_data import load_data
+from functions.parallel import parallel_sweep
+from functions.resample import interval_ms
+from functions.strategy import strategies, indicator_cache, compact_rtol
+
+st = strategies()
+compact_st = strategies(compact=True)
+evaluate = evaluation()
+
+class benchmark:
+    # Timings of the strategy kernels, grid sweeps and the load path on synthetic data.
+    # Every case is run `repeats` times and the fastest run is kept; peak memory comes from one extra run
+    # under tracemalloc (numpy and bottleneck allocations are traced). The indicator cache is cleared before
+    # every run so each one pays for its rolling statistics like a cold call would.
+
+    def __init__(self, repeats: int = 3, seed: int = 0, work_folder: str = "benchmark_results/data"):
+        self.repeats = repeats
+        self.seed = seed
+        self.work_folder = work_folder
+
+    def synthetic(self, n_bars: int, interval: str) -> np.ndarray:
+        # (n_bars, 3) float64 array like load_array: epoch ms, a geometric random walk price and a
+        # slowly drifting variable (exchange-balance-like), reproducible for a given seed
+        rng = np.random.default_rng(self.seed)
+        timestamps = 1_609_459_200_000 + np.arange(n_bars, dtype=np.int64) * interval_ms[interval] # 2021-01-01
+        prices = 30000 * np.exp(np.cumsum(rng.normal(0, 0.004, n_bars)))
+        variables = 300000 + np.cumsum(rng.normal(0, 50, n_bars))
+        return np.column_stack((timestamps.astype(np.float64), prices, variables))
+
+    def measure(self, function: Callable, n_bars: int = None, n_cells: int = None) -> Dict:
+        # Best wall time of `repeats` runs, throughput and peak traced memory of this process; "check" is the
+        # case's return value (a scalar summary of its output) so baselines also catch changed results.
+        # For grid cases n_bars counts bars x cells, i.e. bar evaluations per second.
+        seconds = []
+        for _ in range(self.repeats):
+            indicator_cache.clear()
+            start = time.perf_counter()
+            check = function()
+            seconds.append(time.perf_counter() - start)
+
+        indicator_cache.clear()
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        indicator_cache.clear()
+
+        best = min(seconds)
+        result = {"seconds": best, "peak_mb": peak / 2**20, "check": None if check is None else float(check)}
+        if n_bars is not None:
+            result["bars_per_sec"] = n_bars / best
+        if n_cells is not None:
+            result["cells_per_sec"] = n_cells / best
+        return result
+
+    def run(self, sizes: Dict[str, int], z_threshes: np.ndarray, rolling_hours: List[int],
+            transaction_cost: float = 0.0006, strategy: int = -1, n_workers: int = 1) -> Dict[str, Dict]:
+        # sizes: interval -> number of bars. Rolling windows are given in hours and scaled to every interval,
+        # so each size sweeps the same calendar lookbacks.
+        results = {}
+        for interval, n_bars in sizes.items():
+            numpy_array = self.synthetic(n_bars, interval)
+            bars_per_hour = max(3_600_000 // interval_ms[interval], 1)
+            rolling_periods = np.array([hours * bars_per_hour for hours in rolling_hours])
+            rolling_periods = rolling_periods[rolling_periods < n_bars // 2]
+            period = int(rolling_periods[len(rolling_periods) // 2])
+            shorter = max(period // 4, 2)
+            n_cells = len(z_threshes) * len(rolling_periods)
+            timestamps = numpy_array[:, 0]
+
+            cases = {
+                "bband": (lambda: st.bband(numpy_array, transaction_cost, strategy, 1.0, period, interval)[1]["sharpe_ratio"], n_bars, None),
+                "bband_metrics_only": (lambda: st.bband(numpy_array, transaction_cost, strategy, 1.0, period, interval, metrics_only=True)[1]["sharpe_ratio"], n_bars, None),
+                "SMA_cross": (lambda: st.SMA_cross(numpy_array, transaction_cost, strategy, shorter, period, interval)[1]["sharpe_ratio"], n_bars, None),
+                "compute_metrics": (lambda: self._metrics_case(numpy_array, timestamps), n_bars, None),
+                "bband_grid": (lambda: np.nansum(st.bband_grid(numpy_array, transaction_cost, strategy, z_threshes, rolling_periods, interval)["sharpe_ratio"]), n_bars * n_cells, n_cells),
+                "bband_grid_compact": (lambda: np.nansum(compact_st.bband_grid(numpy_array, transaction_cost, strategy, z_threshes, rolling_periods, interval)["sharpe_ratio"]), n_bars * n_cells, n_cells),
+                "SMA_cross_grid": (lambda: np.nansum(st.SMA_cross_grid(numpy_array, transaction_cost, strategy, np.maximum(rolling_periods // 4, 2), rolling_periods, interval)["sharpe_ratio"]), n_bars * len(rolling_periods) ** 2, len(rolling_periods) ** 2),
+                }
+            if n_workers > 1:
+                sweep = parallel_sweep(n_workers)
+                cases["parallel_sweep"] = (lambda: np.nansum(sweep.run("bband", numpy_array, [(0, n_bars)], transaction_cost, strategy, z_threshes, rolling_periods, interval)[0]["sharpe_ratio"]), n_bars * n_cells, n_cells)
+            for name, (function, bars, cells) in cases.items():
+                results[f"{interval}/{name}"] = self.measure(function, bars, cells)
+                print(f"{interval}/{name}: {self._describe(results[f'{interval}/{name}'])}")
+
+            errors = st.compact_errors("bband", numpy_array, transaction_cost, strategy, z_threshes, rolling_periods, interval)
+            results[f"{interval}/bband_grid_compact"]["max_rel_error"] = max(errors.values())
+            print(f"{interval}/bband_grid_compact: largest relative metric error {max(errors.values()):.2e} (compact_rtol {compact_rtol:.0e})")
+
+            for name, result in self._load_cases(numpy_array, interval).items():
+                results[f"{interval}/{name}"] = result
+                print(f"{interval}/{name}: {self._describe(result)}")
+        return results
+
+    def compare(self, results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = 0.25, memory_tolerance: float = 0.25,
+                slack_seconds: float = 0.005) -> List[str]:
+        # Regressions against a saved baseline: slower or bigger by more than the tolerance (a fraction),
+        # a changed "check" value, or compact metrics further than compact_rtol from float64.
+        # slack_seconds keeps millisecond-scale cases from failing on timer noise.
+        # Timings are only comparable on the machine that saved the baseline.
+        regressions = []
+        for name, result in results.items():
+            if result.get("max_rel_error", 0) > compact_rtol:
+                regressions.append(f"{name}: compact metrics off by {result['max_rel_error']:.2e} (compact_rtol {compact_rtol:.0e})")
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result["seconds"] > base["seconds"] * (1 + tolerance) + slack_seconds:
+                regressions.append(f"{name}: {result['seconds']:.4f}s vs {base['seconds']:.4f}s")
+            if result["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance) + 1:
+                regressions.append(f"{name}: peak {result['peak_mb']:.1f}MB vs {base['peak_mb']:.1f}MB")
+            if result["check"] is not None and base.get("check") is not None and not np.isclose(result["check"], base["check"], rtol=1e-9, equal_nan=True):
+                regressions.append(f"{name}: result {result['check']!r} vs {base['check']!r}")
+        return regressions
+
+    def save(self, results: Dict[str, Dict], path: str):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    def load(self, path: str) -> Dict[str, Dict]:
+        with open(path) as f:
+            return json.load(f)
+
+    def _metrics_case(self, numpy_array: np.ndarray, timestamps: np.ndarray) -> float:
+        # evaluation alone, on a fixed always-in-the-market position
+        prices = numpy_array[:, 1]
+        pct_changes = np.concatenate((np.array([0]), np.diff(prices) / prices[:-1]))
+        positions = np.where(np.arange(len(prices)) % 500 < 250, 1.0, -1.0)
+        prev_positions = np.concatenate((np.array([0.0]), positions[:-1]))
+        pnl = prev_positions * pct_changes - np.abs(positions - prev_positions) * 0.0006
+        return evaluate.compute_metrics(pnl, pct_changes, positions, evaluate.day_starts(timestamps))["sharpe_ratio"]
+
+    def _load_cases(self, numpy_array: np.ndarray, interval: str) -> Dict[str, Dict]:
+        # Cold load parses the cleaned-format CSV and builds the binary cache; warm load memory-maps it
+        folder = os.path.join(self.work_folder, interval)
+        cache_folder = os.path.join(folder, "cache")
+        csv_path = os.path.join(folder, f"synthetic_{interval}.csv")
+        os.makedirs(folder, exist_ok=True)
+        pd.DataFrame({
+            "time": pd.to_datetime(numpy_array[:, 0].astype(np.int64), unit="ms").strftime('%Y-%m-%d %H:%M:%S'),
+            "price": numpy_array[:, 1],
+            "variable": numpy_array[:, 2]
+            }).to_csv(csv_path, index=False)
+        ld = load_data(cache_folder)
+
+        def cold():
+            shutil.rmtree(cache_folder, ignore_errors=True)
+            return ld.load_array(csv_path)[:, 1].sum()
+
+        cases = {"load_cold": self.measure(cold, len(numpy_array))}
+        cases["load_warm"] = self.measure(lambda: ld.load_array(csv_path)[:, 1].sum(), len(numpy_array))
+        shutil.rmtree(folder, ignore_errors=True)
+        return cases
+
+    def _describe(self, result: Dict) -> str:
+        text = f"{result['seconds'] * 1000:.1f} ms"
+        if "bars_per_sec" in result:
+            text += f", {result['bars_per_sec']:,.0f} bars/s"
+        if "cells_per_sec" in result:
+            text += f", {result['cells_per_sec']:,.1f} cells/s"
+        return text + f", peak {result['peak_mb']:.1f} MB"
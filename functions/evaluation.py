@@ -1,4 +1,5 @@
 import numpy as np
+from typing import Dict, Tuple
 
 class evaluation:
     
@@ -19,7 +20,9 @@ class evaluation:
     
     def compute_beta(self, strategy_daily_pnl, asset_daily_pct_change: np.ndarray):
         # beta = covariance(strategy daily return, buy and hold daily return) / variance(buy and hold daily return)
-        np.cov(asset_daily_pct_change, strategy_daily_pnl)[0, 1] / np.var(asset_daily_pct_change)
+        # both population (ddof=0) moments
+        beta = np.cov(asset_daily_pct_change, strategy_daily_pnl, bias=True)[0, 1] / np.var(asset_daily_pct_change)
+        return beta
 
     def compute_maximum_drawdown(self, pnl: np.ndarray) -> float:
         # maximum of absolute value of drawdowns
@@ -27,3 +30,98 @@ class evaluation:
         drawdowns = cumulative_earnings_pct - np.maximum.accumulate(cumulative_earnings_pct)
         MDD = np.min(drawdowns)
         return MDD
+
+    def bucket_keys(self, timestamps: np.ndarray, bucket: str = "D") -> np.ndarray:
+        # UTC day ("D") or Monday-based week ("W") number of every bar.
+        # Timestamps are epoch milliseconds or '%Y-%m-%d %H:%M:%S' UTC strings.
+        timestamps = np.asarray(timestamps)
+        if timestamps.dtype.kind in "iuf":
+            epoch = timestamps.astype(np.int64)
+        else:
+            epoch = timestamps.astype("datetime64[ms]").astype(np.int64)
+        days = epoch // 86_400_000
+        if bucket == "D":
+            return days
+        if bucket == "W":
+            return (days + 3) // 7 # 1970-01-01 was a Thursday
+        raise ValueError(f"Unknown bucket: {bucket}")
+
+    def segment_starts(self, keys: np.ndarray) -> np.ndarray:
+        # Index of the first bar of every run of equal keys in time-sorted bars, in one O(N) pass
+        keys = np.asarray(keys)
+        if len(keys) == 0:
+            return np.array([], dtype=np.intp)
+        return np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+
+    def day_starts(self, timestamps: np.ndarray, bucket: str = "D") -> np.ndarray:
+        # First bar of every calendar day (or week). Unlike fixed bar counts, gaps in the data and
+        # intervals of any length never move a bar into the wrong day.
+        return self.segment_starts(self.bucket_keys(timestamps, bucket))
+
+    def daily_sum(self, values: np.ndarray, day_starts: np.ndarray) -> np.ndarray:
+        # Sum the bars of each day along the last axis, accumulating in float64 whatever the input dtype
+        if values.shape[-1] == 0:
+            return values[..., :0].astype(np.float64)
+        return np.add.reduceat(values, day_starts, axis=-1, dtype=np.float64)
+
+    def compute_metrics(self, pnl: np.ndarray, pct_changes: np.ndarray, positions: np.ndarray, day_starts: np.ndarray) -> Dict:
+        # Every evaluation metric from bar-level pnl in one routine, for one (1D) or many (2D, one row per
+        # parameter set) position vectors over the same bars. pct_changes is the asset's bar-level return and
+        # may be shared by all rows. day_starts comes from day_starts(timestamps). Daily aggregation is done
+        # once and reused by Sharpe, Calmar and beta.
+        # Returns scalars for 1D input and one value per row for 2D input.
+        single = np.ndim(pnl) == 1
+        pnl = np.atleast_2d(pnl)
+        positions = np.atleast_2d(positions)
+
+        strategy_daily_pnl = self.daily_sum(pnl, day_starts)
+        asset_daily_pct_change = self.daily_sum(np.atleast_2d(pct_changes), day_starts)
+
+        trades = np.diff(positions, axis=1, prepend=0)
+
+        maximum_drawdown = self.compute_maximum_drawdowns(pnl)
+        sharpe_ratio, calmar_ratio = self.compute_ratios(strategy_daily_pnl, maximum_drawdown)
+        beta = self.compute_betas(strategy_daily_pnl, asset_daily_pct_change)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            long_short_duration_ratio = np.sum(positions > 0, axis=1) / np.sum(positions < 0, axis=1)
+
+        metrics = {
+            "sharpe_ratio": sharpe_ratio,
+            "calmar_ratio": calmar_ratio,
+            "beta": beta,
+            "maximum_drawdown": maximum_drawdown,
+            "long_short_duration_ratio": long_short_duration_ratio,
+            "number_of_trades": np.count_nonzero(trades, axis=1)
+            }
+        if single:
+            metrics = {key: values[0] for key, values in metrics.items()}
+        return metrics
+
+    def compute_ratios(self, strategy_daily_pnl: np.ndarray, maximum_drawdown: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Sharpe and Calmar ratio of every row of a (rows, days) daily pnl array, as in compute_metrics
+        n_days = strategy_daily_pnl.shape[1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe_ratio = (self.day_count ** 0.5) * strategy_daily_pnl.mean(axis=1) / strategy_daily_pnl.std(axis=1)
+            cumulative_return = np.prod(1 + strategy_daily_pnl, axis=1)
+            avg_annual_return = (cumulative_return ** (1 / (n_days / self.day_count))) - 1
+            calmar_ratio = avg_annual_return / -maximum_drawdown
+        return sharpe_ratio, calmar_ratio
+
+    def compute_betas(self, strategy_daily_pnl: np.ndarray, asset_daily_pct_change: np.ndarray) -> np.ndarray:
+        # beta of every row of a (rows, days) daily pnl array against the asset's daily returns (one shared row)
+        # same estimator as compute_beta: population covariance over population variance
+        with np.errstate(divide='ignore', invalid='ignore'):
+            asset_deviation = asset_daily_pct_change - asset_daily_pct_change.mean(axis=1, keepdims=True)
+            covariance = np.mean(asset_deviation * (strategy_daily_pnl - strategy_daily_pnl.mean(axis=1)[:, None]), axis=1)
+            return covariance / asset_daily_pct_change.var(axis=1)
+
+    def compute_maximum_drawdowns(self, pnl: np.ndarray, max_elements: int = 4_000_000) -> np.ndarray:
+        # compute_maximum_drawdown of every row, accumulated in float64. Rows are processed in chunks of at
+        # most max_elements values so the float64 running sums of long histories never exist all at once.
+        rows_per_chunk = max(1, max_elements // max(pnl.shape[1], 1))
+        maximum_drawdown = np.empty(len(pnl))
+        for start in range(0, len(pnl), rows_per_chunk):
+            cum_pnl = np.cumsum(pnl[start:start + rows_per_chunk], axis=1, dtype=np.float64)
+            maximum_drawdown[start:start + rows_per_chunk] = np.min(cum_pnl - np.maximum.accumulate(cum_pnl, axis=1), axis=1)
+        return maximum_drawdown
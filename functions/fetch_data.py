@@ -1,7 +1,11 @@
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 import pandas as pd
 import requests
+import threading
 import json
+import time
 import os
 
 class fetch_data:
@@ -14,10 +18,44 @@ class fetch_data:
         self.api_key_santiment = os.getenv('api_key_santiment')
         self.api_key_nodechart = os.getenv('api_key_nodechart')
 
+        self.binance_klines_url = "https://fapi.binance.com/fapi/v1/klines"
+        self.binance_weight_limit = 2000 # Binance futures allows 2400 request weight per minute per IP; keep some headroom
+        self.max_retries = 5
+        self.backoff_seconds = 1.0
+        self._weight_lock = threading.Lock()
+        self._weight_minute = 0
+        self._weight_used = 0
+
     def get_price(self, symbol: str, endpoint: str, interval: str, 
-                  startTime: datetime, endTime: datetime, limit: int = 1000) -> pd.DataFrame:
-        url = "https://fapi.binance.com/fapi/v1/klines"
-        df = pd.DataFrame()
+                  startTime: datetime, endTime: datetime, limit: int = 1000, epoch_ms: bool = False,
+                  max_workers: int = 8) -> pd.DataFrame:
+        # epoch_ms=True keeps "open time" / "close time" as int64 epoch milliseconds instead of strings
+        return self.get_prices([symbol], endpoint, interval, startTime, endTime, limit, epoch_ms, max_workers)[symbol]
+
+    def get_prices(self, symbols: List[str], endpoint: str, interval: str,
+                   startTime: datetime, endTime: datetime, limit: int = 1000, epoch_ms: bool = False,
+                   max_workers: int = 8) -> Dict[str, pd.DataFrame]:
+        # Download klines of several symbols at once. Every (symbol, time window) page is fetched concurrently
+        # over one pooled session, throttled by Binance's request weight, and each symbol is assembled
+        # with a single concat once all of its pages are in.
+        windows = self._kline_windows(interval, startTime, endTime)
+        jobs = [(symbol, start, end) for symbol in symbols for start, end in windows]
+        session = self._binance_session(max_workers)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pages = list(executor.map(lambda job: self._get_klines(session, job[0], interval, job[1], job[2], limit), jobs))
+        finally:
+            session.close()
+
+        dfs = {}
+        for symbol in symbols:
+            frames = [pd.DataFrame(page) for (job_symbol, _, _), page in zip(jobs, pages) if job_symbol == symbol and len(page) > 0]
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=range(12))
+            dfs[symbol] = self._format_klines(df, epoch_ms)
+        return dfs
+
+    def _kline_windows(self, interval: str, startTime: datetime, endTime: datetime) -> List[Tuple[int, int]]:
+        # Split the range into windows of at most 1000 bars (the Binance page size)
         start_timestamp = int(startTime.timestamp()*1000)
         end_timestamp = int(endTime.timestamp()*1000)
         current_timestamp = start_timestamp
@@ -29,28 +67,85 @@ class fetch_data:
             "1h": 960
         }
         time_interval = mapping.get(interval, 1)
+        windows = []
         while current_timestamp <= end_timestamp:
-            startTime = current_timestamp
+            window_start = current_timestamp
             current_timestamp += (time_interval * 60 * 60 * 1000)
-            endTime = current_timestamp - 10
-            url = "https://fapi.binance.com/fapi/v1/klines"
-            params = {
-                "symbol": symbol,
-                "interval": interval,
-                "startTime": startTime,
-                "endTime": endTime,
-                "limit": limit
-            }
-            response = requests.get(url, params=params)
-            data = response.json()
-            df_temp = pd.DataFrame(data)
-            df = pd.concat([df, df_temp], ignore_index=True)
+            windows.append((window_start, current_timestamp - 10))
+        return windows
+
+    def _binance_session(self, max_workers: int) -> requests.Session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get_klines(self, session: requests.Session, symbol: str, interval: str, startTime: int, endTime: int, limit: int) -> list:
+        params = {
+            "symbol": symbol,
+            "interval": interval,
+            "startTime": startTime,
+            "endTime": endTime,
+            "limit": limit
+        }
+        weight = 10 if limit > 1000 else 5 if limit >= 500 else 2 if limit >= 100 else 1
+        for attempt in range(self.max_retries):
+            self._acquire_binance_weight(weight)
+            try:
+                response = session.get(self.binance_klines_url, params=params, timeout=30)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                print(f"Error fetching klines for {symbol} at {startTime} (attempt {attempt + 1}): {e}")
+                time.sleep(self.backoff_seconds * 2 ** attempt)
+                continue
+
+            self._update_binance_weight(response)
+            if response.status_code in (418, 429):
+                # rate limited (418 = IP banned for ignoring 429); Binance says how long to wait
+                retry_after = float(response.headers.get("Retry-After", self.backoff_seconds * 2 ** attempt))
+                print(f"Rate limited by Binance, retrying {symbol} at {startTime} in {retry_after}s")
+                time.sleep(retry_after)
+                continue
+            if response.status_code >= 500:
+                time.sleep(self.backoff_seconds * 2 ** attempt)
+                continue
+            response.raise_for_status()
+            return response.json()
+        raise RuntimeError(f"Failed to fetch klines for {symbol} at {startTime} after {self.max_retries} attempts")
+
+    def _acquire_binance_weight(self, weight: int):
+        # Wait for the next minute once this minute's budget would be exceeded.
+        # The lock is held while waiting so that every thread pauses together.
+        with self._weight_lock:
+            minute = int(time.time() // 60)
+            if minute != self._weight_minute:
+                self._weight_minute = minute
+                self._weight_used = 0
+            if self._weight_used + weight > self.binance_weight_limit:
+                time.sleep((minute + 1) * 60 - time.time())
+                self._weight_minute = minute + 1
+                self._weight_used = 0
+            self._weight_used += weight
+
+    def _update_binance_weight(self, response: requests.Response):
+        # Binance reports the weight used in the current minute across all of this IP's requests
+        used_weight = response.headers.get("X-MBX-USED-WEIGHT-1M")
+        if used_weight is not None:
+            with self._weight_lock:
+                if int(time.time() // 60) == self._weight_minute:
+                    self._weight_used = max(self._weight_used, int(used_weight))
+
+    def _format_klines(self, df: pd.DataFrame, epoch_ms: bool) -> pd.DataFrame:
         df = df.rename(columns = {0: "open time", 1:"open", 2:"high", 3:"low", 4:"close", 5:"volume", 6:"close time", 7:"quote asset volume", 8:"number of trades", 9:"taker buy base asset volume", 10:"taker buy quote asset volume"})    
         df = df.iloc[:, :-1]
-        df['open time'] = pd.to_datetime(df['open time'], unit='ms')
-        df['open time'] = df['open time'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        df['close time'] = pd.to_datetime(df['close time'], unit='ms')
-        df['close time'] = df['close time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        if epoch_ms:
+            df['open time'] = df['open time'].astype('int64')
+            df['close time'] = df['close time'].astype('int64')
+        else:
+            df['open time'] = pd.to_datetime(df['open time'], unit='ms')
+            df['open time'] = df['open time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+            df['close time'] = pd.to_datetime(df['close time'], unit='ms')
+            df['close time'] = df['close time'].dt.strftime('%Y-%m-%d %H:%M:%S')
 
         df = df.drop_duplicates(subset='open time', keep='first')
 
@@ -58,7 +153,8 @@ class fetch_data:
 
     def get_data_from_glassnode(self, symbol: str, endpoint: str, interval: str, 
                                 startTime: datetime, endTime: datetime, 
-                                exchange: str = "binance") -> pd.DataFrame:
+                                exchange: str = "binance", epoch_ms: bool = False) -> pd.DataFrame:
+        # epoch_ms=True returns "time" as int64 epoch milliseconds (Glassnode itself returns seconds)
         try:
             startTimestamp = int(startTime.timestamp())
             endTimestamp = int(endTime.timestamp())
@@ -87,7 +183,10 @@ class fetch_data:
                 columns={"t": "time", "v": "value"},
                 inplace=True,
             )
-            data["time"] = pd.to_datetime(data["time"], unit="s").dt.strftime("%Y-%m-%d %H:%M:%S")
+            if epoch_ms:
+                data["time"] = data["time"].astype("int64") * 1000
+            else:
+                data["time"] = pd.to_datetime(data["time"], unit="s").dt.strftime("%Y-%m-%d %H:%M:%S")
 
             return data
         
@@ -0,0 +1,157 @@
+import math
+from typing import Dict, List, Optional
+
+class rolling_window:
+    # O(1) per bar rolling mean and variance over the last `window` values.
+    # The arithmetic follows bottleneck's move_mean / move_var (running sum for the mean, running
+    # mean and sum of squared deviations for the variance, NaNs skipped, NaN output until the window
+    # holds `window` valid values), so replayed history reproduces strategies bit for bit.
+
+    def __init__(self, window: int):
+        self.window = int(window)
+        self.values = [math.nan] * self.window
+        self.i = 0
+        self.count = 0
+        self.asum = 0.0
+        self.amean = 0.0
+        self.assqdm = 0.0
+        self.count_inv = math.inf
+
+    def update(self, ai: float):
+        # Add one value; returns (mean, variance)
+        ai = float(ai)
+        slot = self.i % self.window
+        aold = self.values[slot]
+        self.values[slot] = ai
+
+        if self.i < self.window:
+            # filling the first window
+            if ai == ai:
+                self.asum += ai
+                self.count += 1
+                delta = ai - self.amean
+                self.amean += delta / self.count
+                self.assqdm += delta * (ai - self.amean)
+            if self.i == self.window - 1:
+                self.count_inv = 1.0 / self.count if self.count else math.inf
+            self.i += 1
+            if self.i < self.window or self.count < self.window:
+                return math.nan, math.nan
+            if self.assqdm < 0:
+                self.assqdm = 0.0
+            return self.asum / self.count, self.assqdm / self.count
+
+        if ai == ai:
+            if aold == aold:
+                self.asum += ai - aold
+                delta = ai - aold
+                aold -= self.amean
+                self.amean += delta * self.count_inv
+                ai -= self.amean
+                self.assqdm += (ai + aold) * delta
+            else:
+                self.asum += ai
+                self.count += 1
+                self.count_inv = 1.0 / self.count
+                delta = ai - self.amean
+                self.amean += delta * self.count_inv
+                self.assqdm += delta * (ai - self.amean)
+        elif aold == aold:
+            self.asum -= aold
+            self.count -= 1
+            self.count_inv = 1.0 / self.count if self.count else math.inf
+            if self.count > 0:
+                delta = aold - self.amean
+                self.amean -= delta * self.count_inv
+                self.assqdm -= delta * (aold - self.amean)
+            else:
+                self.amean = 0.0
+                self.assqdm = 0.0
+        self.i += 1
+
+        if self.count < self.window:
+            return math.nan, math.nan
+        if self.assqdm < 0:
+            self.assqdm = 0.0
+        return self.asum * self.count_inv, self.assqdm * self.count_inv
+
+class _position_stream:
+    # Shared per-bar accounting: turns the position decided on a bar into the trade and pnl of that bar,
+    # exactly like the positions / trades / pnl columns of the strategy DataFrames.
+
+    def __init__(self, transaction_cost: float, warm_up: int):
+        self.transaction_cost = transaction_cost
+        self.warm_up = warm_up
+        self.n_bars = 0
+        self.position = 0
+        self.prev_price = None
+        self.cum_pnl = 0.0
+
+    def _emit(self, timestamp, price: float, position: float) -> Dict:
+        pct_change = 0.0 if self.prev_price is None else (price - self.prev_price) / self.prev_price
+        trade = position - self.position
+        pnl = self.position * pct_change - abs(trade) * self.transaction_cost
+        self.cum_pnl += pnl
+        self.position = position
+        self.prev_price = price
+        return {"timestamp": timestamp, "position": position, "trade": trade, "pnl": pnl, "cum_pnl": self.cum_pnl}
+
+    def update_batch(self, bars: List[tuple]) -> List[Dict]:
+        # bars: (timestamp, price, variable) tuples; warm-up bars produce no update
+        updates = [self.update(*bar) for bar in bars]
+        return [update for update in updates if update is not None]
+
+class bband_stream(_position_stream):
+    # Live counterpart of strategies.bband: feed one bar at a time, get the position, trade and pnl of that bar.
+    # The first rolling_period - 1 bars only warm up the rolling window (strategies.bband drops them too).
+
+    def __init__(self, transaction_cost: float, strategy: int, z_thresh: float, rolling_period: int):
+        super().__init__(transaction_cost, int(rolling_period) - 1)
+        self.strategy = strategy
+        self.z_thresh = z_thresh
+        self.rolling = rolling_window(rolling_period)
+        self.state = 0
+
+    def update(self, timestamp, price: float, variable: float) -> Optional[Dict]:
+        sma, var = self.rolling.update(variable)
+        self.n_bars += 1
+        if self.n_bars <= self.warm_up:
+            return None
+
+        z = (float(variable) - sma) / math.sqrt(var) if var > 0 else self._z_zero_std(float(variable) - sma)
+        # same enter / hold / exit rules as strategies.bband_positions
+        if z >= self.z_thresh:
+            self.state = self.strategy
+        elif z <= -self.z_thresh:
+            self.state = -self.strategy
+        elif z > 0 and self.state == self.strategy:
+            pass
+        elif z < 0 and self.state == -self.strategy:
+            pass
+        else:
+            self.state = 0
+        return self._emit(timestamp, float(price), self.state)
+
+    def _z_zero_std(self, deviation: float) -> float:
+        # numpy division semantics for a zero (or NaN) standard deviation: +-inf, or NaN for 0 / 0
+        if deviation != deviation or deviation == 0:
+            return math.nan
+        return math.copysign(math.inf, deviation)
+
+class SMA_cross_stream(_position_stream):
+    # Live counterpart of strategies.SMA_cross; the first longer_period - 1 bars warm up the moving averages.
+
+    def __init__(self, transaction_cost: float, strategy: int, shorter_period: int, longer_period: int):
+        super().__init__(transaction_cost, int(longer_period) - 1)
+        self.strategy = strategy
+        self.shorter = rolling_window(shorter_period)
+        self.longer = rolling_window(longer_period)
+
+    def update(self, timestamp, price: float, variable: float) -> Optional[Dict]:
+        shorter_ma, _ = self.shorter.update(variable)
+        longer_ma, _ = self.longer.update(variable)
+        self.n_bars += 1
+        if self.n_bars <= self.warm_up:
+            return None
+        position = self.strategy if shorter_ma > longer_ma else -self.strategy
+        return self._emit(timestamp, float(price), position)
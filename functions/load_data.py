@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from functions.profiling import profile
+
+class load_data:
+
+    def __init__(self, cache_folder: str = "cache"):
+        self.cache_folder = cache_folder
+
+    def load_cleaned(self, csv_path: str) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        # Load a cleaned dataset (time column first, numeric columns after it) as
+        # (int64 epoch milliseconds, float64 values with one column per remaining CSV column, column names).
+        # The values are a view of the memory-mapped cache of load_array.
+        numpy_array, columns = self._load_cache(csv_path)
+        return numpy_array[:, 0].astype(np.int64), numpy_array[:, 1:], columns
+
+    def load_array(self, csv_path: str) -> np.ndarray:
+        # (N, 1 + k) float64 array laid out like the cleaned CSV, ready for strategies and parallel_sweep.
+        # Column 0 holds the epoch milliseconds, which float64 represents exactly.
+        # The array is the read-only memory map of the cache file itself, so nothing is copied on load.
+        with profile.stage("load"):
+            numpy_array, _ = self._load_cache(csv_path)
+        return numpy_array
+
+    def _load_cache(self, csv_path: str) -> Tuple[np.ndarray, List[str]]:
+        # The CSV is parsed once into <cache_folder>/<name>.npy, the (N, 1 + k) float64 array of load_array;
+        # later loads memory-map it. The cache is rebuilt whenever the source CSV's size or modification time changes.
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        numpy_array, meta = self.read_cache(name, csv_path)
+        if numpy_array is None:
+            self._build_cache(csv_path, name)
+            numpy_array, meta = self.read_cache(name, csv_path)
+        return numpy_array, meta["columns"]
+
+    def read_cache(self, name: str, source_path: str) -> Tuple[Optional[np.ndarray], Optional[dict]]:
+        # Read-only memory map of <cache_folder>/<name>.npy and its metadata, or (None, None) when it is missing
+        # or was built from another version of source_path
+        array_path = os.path.join(self.cache_folder, f"{name}.npy")
+        meta_path = os.path.join(self.cache_folder, f"{name}.json")
+        if not (os.path.exists(meta_path) and os.path.exists(array_path)):
+            return None, None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if any(meta.get(key) != value for key, value in self.source_meta(source_path).items()):
+            return None, None
+        return np.load(array_path, mmap_mode="r"), meta
+
+    def write_cache(self, name: str, source_path: str, numpy_array: np.ndarray, **meta) -> dict:
+        # Store numpy_array as <cache_folder>/<name>.npy with the source's size and modification time (plus meta)
+        # in <name>.json. Both are written to temporary files first, so an interrupted rebuild never leaves a
+        # half-written cache behind.
+        os.makedirs(self.cache_folder, exist_ok=True)
+        array_path = os.path.join(self.cache_folder, f"{name}.npy")
+        meta_path = os.path.join(self.cache_folder, f"{name}.json")
+        with open(array_path + ".tmp", "wb") as f:
+            np.save(f, numpy_array)
+        os.replace(array_path + ".tmp", array_path)
+
+        meta = dict(self.source_meta(source_path), **meta)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        # older caches kept the timestamps and the values in two files
+        for suffix in (".time.npy", ".values.npy"):
+            stale_path = os.path.join(self.cache_folder, name + suffix)
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+        return meta
+
+    def source_meta(self, path: str) -> dict:
+        source = os.stat(path)
+        return {"source": os.path.abspath(path), "size": source.st_size, "mtime_ns": source.st_mtime_ns}
+
+    def to_epoch_ms(self, times: np.ndarray) -> np.ndarray:
+        # Accept either epoch milliseconds or '%Y-%m-%d %H:%M:%S' UTC strings
+        times = np.asarray(times)
+        if times.dtype.kind in "iuf":
+            return times.astype(np.int64)
+        return times.astype("datetime64[ms]").astype(np.int64)
+
+    def _build_cache(self, csv_path: str, name: str) -> dict:
+        df = pd.read_csv(csv_path)
+        numpy_array = np.empty((len(df), df.shape[1]), dtype=np.float64)
+        numpy_array[:, 0] = self.to_epoch_ms(df.iloc[:, 0].to_numpy())
+        numpy_array[:, 1:] = df.iloc[:, 1:].to_numpy(dtype=np.float64)
+        return self.write_cache(name, csv_path, numpy_array, columns=list(df.columns))
+
+    def last_timestamp(self, csv_path: str) -> Optional[int]:
+        # Epoch milliseconds in the first column of the last row, read from the end of the file.
+        # None when the file is missing or has no data rows.
+        last_line = self._last_line(csv_path)
+        if last_line is None:
+            return None
+        return self._parse_time(last_line.split(',')[0])
+
+    def resume_time(self, csv_paths: List[str], default: datetime) -> datetime:
+        # Where an incremental refresh of these files has to start: the earliest of their last timestamps
+        # (that row is fetched again and deduped), or default when any of them has no data yet
+        last_timestamps = [self.last_timestamp(csv_path) for csv_path in csv_paths]
+        if any(last is None for last in last_timestamps):
+            return default
+        return datetime.fromtimestamp(min(last_timestamps) / 1000, tz=timezone.utc)
+
+    def append_csv(self, csv_path: str, df: pd.DataFrame, time_columns: List[str]) -> int:
+        # Append the rows of df that are newer than the last stored row (time_columns[0] is the key).
+        # Rows are reordered to the stored header and timestamps converted to the stored format
+        # (epoch milliseconds or '%Y-%m-%d %H:%M:%S'), so old and new rows never mix formats.
+        last = self.last_timestamp(csv_path)
+        if last is not None:
+            df = df[self.to_epoch_ms(df[time_columns[0]].to_numpy()) > last]
+
+        if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+            df.to_csv(csv_path, index=False)
+            return len(df)
+
+        with open(csv_path) as f:
+            header = f.readline().strip().split(',')
+        df = df[header].copy()
+        stored_as_epoch = last is None or self._last_line(csv_path).split(',')[0].isdigit()
+        for column in time_columns:
+            epoch = self.to_epoch_ms(df[column].to_numpy())
+            df[column] = epoch if stored_as_epoch else pd.to_datetime(epoch, unit="ms").strftime('%Y-%m-%d %H:%M:%S')
+        df.to_csv(csv_path, mode="a", header=False, index=False)
+        return len(df)
+
+    def _parse_time(self, value: str) -> int:
+        if value.isdigit():
+            return int(value)
+        return int(np.datetime64(value, "ms").astype(np.int64))
+
+    def _last_line(self, csv_path: str) -> Optional[str]:
+        if not os.path.exists(csv_path):
+            return None
+        with open(csv_path, "rb") as f:
+            header = f.readline()
+            size = f.seek(0, os.SEEK_END)
+            block = b""
+            position = size
+            # read backwards until the block holds a complete last line
+            while position > len(header):
+                step = min(4096, position - len(header))
+                position -= step
+                f.seek(position)
+                block = f.read(step) + block
+                if block.rstrip(b"\r\n").count(b"\n") > 0:
+                    break
+        lines = block.rstrip(b"\r\n").splitlines()
+        if not lines or not lines[-1].strip():
+            return None
+        return lines[-1].decode()
@@ -0,0 +1,129 @@
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Tuple
+from functions.profiling import profile
+from functions.strategy import strategies
+
+st = strategies()
+compact_st = strategies(compact=True)
+
+# Worker-side view of the shared dataset, attached once per process by _attach
+_shared_block = None
+_shared_array = None
+
+def _attach(name: str, shape: Tuple[int, int]):
+    global _shared_block, _shared_array
+    _shared_block = shared_memory.SharedMemory(name=name)
+    _shared_array = np.ndarray(shape, dtype=np.float64, buffer=_shared_block.buf)
+
+def _run_unit(unit: Tuple) -> Tuple[int, int, Dict[str, np.ndarray], Dict]:
+    # One work unit: one column of the grid (every row parameter) of one job.
+    # With profiling on, the unit's stage totals travel back with it and are merged by the caller.
+    job_no, j, start, stop, strategy_name, transaction_cost, strategy, row_params, col_param, interval, compact = unit
+    with profile.collect() as stats:
+        with profile.stage(f"{strategy_name}_grid"):
+            tables = (compact_st if compact else st).grid(strategy_name, _shared_array[start:stop], transaction_cost, strategy, row_params, np.array([col_param]), interval)
+    return job_no, j, {key: values[:, 0] for key, values in tables.items()}, stats
+
+class parallel_sweep:
+    # compact=True evaluates every unit with strategies(compact=True); see accounting
+
+    def __init__(self, n_workers: int = None, compact: bool = False):
+        self.n_workers = n_workers or mp.cpu_count()
+        self.compact = compact
+
+    def to_float_array(self, numpy_array: np.ndarray) -> np.ndarray:
+        # Strategies only need numbers: timestamps become epoch milliseconds, prices and variables float64
+        if numpy_array.dtype.kind in "fiu":
+            return np.ascontiguousarray(numpy_array, dtype=np.float64)
+        float_array = np.empty(numpy_array.shape, dtype=np.float64)
+        float_array[:, 0] = numpy_array[:, 0].astype("datetime64[ms]").astype(np.int64)
+        float_array[:, 1:] = numpy_array[:, 1:].astype(float)
+        return float_array
+
+    def run(self, strategy_name: str, numpy_array: np.ndarray, test_ranges: List[Tuple[int, int]],
+            transaction_cost: float, strategy: int, row_params: np.ndarray, col_params: np.ndarray,
+            interval: str, masks: List[np.ndarray] = None) -> List[Dict[str, np.ndarray]]:
+        # Sweep strategies.grid of a registered strategy over every (test set, column parameter) pair in a process pool.
+        # test_ranges are (start, stop) row ranges of numpy_array; one table dict is returned per test set.
+        # masks (optional, one boolean (row, column) array per test set) limit the sweep to the True cells;
+        # the other cells are NaN in the returned tables.
+        if masks is None:
+            jobs = [(start, stop, strategy_name, transaction_cost, strategy, row_params, col_params, interval)
+                    for start, stop in test_ranges]
+            return self.run_jobs(numpy_array, jobs)
+
+        results = [{key: np.full(values.shape, np.nan) for key, values in st._empty_tables(len(row_params), len(col_params)).items()}
+                   for _ in test_ranges]
+        jobs, job_meta = [], []
+        for test_no, (start, stop) in enumerate(test_ranges):
+            for rows, cols in self.group_cells(masks[test_no]):
+                jobs.append((start, stop, strategy_name, transaction_cost, strategy,
+                             np.asarray(row_params)[rows], np.asarray(col_params)[cols], interval))
+                job_meta.append((test_no, rows, cols))
+        if jobs:
+            for (test_no, rows, cols), tables in zip(job_meta, self.run_jobs(numpy_array, jobs)):
+                for key, values in tables.items():
+                    results[test_no][key][np.ix_(rows, cols)] = values
+        return results
+
+    def group_cells(self, mask: np.ndarray) -> List[Tuple[List[int], List[int]]]:
+        # (rows, cols) groups covering the True cells of a (row, column) mask: columns that need the same rows
+        # share one job, so scattered cells still cost one grid call per column
+        groups = {}
+        for j in range(mask.shape[1]):
+            rows = tuple(np.flatnonzero(mask[:, j]))
+            if rows:
+                groups.setdefault(rows, []).append(j)
+        return [(list(rows), cols) for rows, cols in groups.items()]
+
+    def run_jobs(self, numpy_array: np.ndarray, jobs: List[Tuple], on_unit: Callable = None) -> List[Dict[str, np.ndarray]]:
+        # Run many grid sweeps in one pool. A job is
+        # (start, stop, strategy_name, transaction_cost, strategy, row_params, col_params, interval)
+        # over rows start:stop of numpy_array, so several datasets can be stacked into one array.
+        # The array is placed in shared memory once and every worker slices it in place instead of receiving
+        # a pickled copy. Work is split into (job, column parameter) units; tables are assembled by index,
+        # so the output does not depend on completion order.
+        # on_unit(job_no, j, columns) is called in this process as each unit finishes, e.g. to persist it.
+        # Profiling stage totals of the workers are merged into this process's profile.
+        global _shared_array, _shared_block
+        float_array = self.to_float_array(numpy_array)
+        units = [(job_no, j, start, stop, strategy_name, transaction_cost, strategy, row_params, col_param, interval, self.compact)
+                 for job_no, (start, stop, strategy_name, transaction_cost, strategy, row_params, col_params, interval) in enumerate(jobs)
+                 for j, col_param in enumerate(col_params)]
+        results = [st._empty_tables(len(job[5]), len(job[6])) for job in jobs]
+
+        block = shared_memory.SharedMemory(create=True, size=max(float_array.nbytes, 1))
+        try:
+            shared_array = np.ndarray(float_array.shape, dtype=np.float64, buffer=block.buf)
+            shared_array[:] = float_array
+            del float_array
+
+            if self.n_workers == 1:
+                _attach(block.name, shared_array.shape)
+                outputs = map(_run_unit, units)
+                for job_no, j, columns, stats in outputs:
+                    profile.merge(stats)
+                    for key, values in columns.items():
+                        results[job_no][key][:, j] = values
+                    if on_unit is not None:
+                        on_unit(job_no, j, columns)
+            else:
+                with mp.Pool(self.n_workers, initializer=_attach, initargs=(block.name, shared_array.shape)) as pool:
+                    for job_no, j, columns, stats in pool.imap_unordered(_run_unit, units):
+                        profile.merge(stats)
+                        for key, values in columns.items():
+                            results[job_no][key][:, j] = values
+                        if on_unit is not None:
+                            on_unit(job_no, j, columns)
+            del shared_array
+        finally:
+            if _shared_block is not None and _shared_block.name == block.name:
+                _shared_array = None
+                _shared_block.close()
+                _shared_block = None
+            block.close()
+            block.unlink()
+
+        return results
@@ -0,0 +1,111 @@
+import numpy as np
+import bottleneck as bn
+import pandas as pd
+from typing import Dict
+from functions.evaluation import evaluation
+
+evaluate = evaluation()
+
+class portfolio:
+    # Combines many strategy pnl streams (strategies.run DataFrames, walk-forward out-of-sample pnl, other coins
+    # and intervals) into one portfolio. Streams are aligned on the union of their epoch-millisecond bars with
+    # sorted-merge joins (np.searchsorted of every sorted stream into the sorted timeline), into one
+    # (streams, bars) float64 matrix; a stream contributes 0 pnl on bars it does not have.
+    # Weights are fixed (equal by default) or inverse-volatility: each stream's weight follows 1 / its trailing
+    # standard deviation of bar pnl over vol_window bars, known at the previous bar, normalised to sum to 1
+    # (a stream flat over the window gets weight 0).
+    # Metrics of every stream and of the portfolio are computed by evaluation over the shared timeline, so a
+    # stream's days without bars count as flat days (its metrics can differ from those of its own run).
+
+    def __init__(self, vol_window: int = None):
+        self.vol_window = vol_window
+        self.names = []
+        self._timestamps = []
+        self._pnl = []
+
+    def add(self, name: str, timestamps: np.ndarray, pnl: np.ndarray):
+        # One stream of bar pnl; timestamps are epoch milliseconds in ascending order
+        timestamps = np.asarray(timestamps).astype(np.int64)
+        if len(timestamps) > 1 and np.any(np.diff(timestamps) <= 0):
+            raise ValueError(f"timestamps of {name} must be strictly increasing")
+        self.names.append(name)
+        self._timestamps.append(timestamps)
+        self._pnl.append(np.asarray(pnl, dtype=np.float64))
+
+    def add_run(self, name: str, df: pd.DataFrame):
+        # The per-bar DataFrame returned by strategies.run / bband / SMA_cross
+        self.add(name, df["timestamps"].to_numpy(), df["pnl"].to_numpy())
+
+    def align(self):
+        # (timeline, matrix): the sorted union of every stream's bars and the (streams, bars) pnl matrix on it.
+        # Streams that share their bars with the first one (the usual case) skip the union and the search.
+        if not self.names:
+            raise ValueError("portfolio has no streams, add some first")
+        first = self._timestamps[0]
+        if all(len(timestamps) == len(first) and np.array_equal(timestamps, first) for timestamps in self._timestamps):
+            timeline = first
+        else:
+            timeline = np.unique(np.concatenate(self._timestamps))
+        matrix = np.zeros((len(self.names), len(timeline)))
+        for i, (timestamps, pnl) in enumerate(zip(self._timestamps, self._pnl)):
+            if timestamps is timeline or np.array_equal(timestamps, timeline):
+                matrix[i] = pnl
+            else:
+                matrix[i, np.searchsorted(timeline, timestamps)] = pnl
+        return timeline, matrix
+
+    def weights(self, matrix: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+        # (streams, 1) fixed weights, or (streams, bars) inverse-volatility weights when vol_window is set.
+        # A stream that was flat over its trailing window (zero volatility) gets weight 0 and the others share
+        # the whole weight; the fixed weights are used before vol_window bars of history and while every
+        # stream is flat.
+        n_streams = len(matrix)
+        fixed = np.full(n_streams, 1 / n_streams) if weights is None else np.asarray(weights, dtype=float)
+        fixed = fixed[:, None]
+        if self.vol_window is None:
+            return fixed
+        # built in place in one (streams, bars) buffer: volatility -> inverse volatility -> weights
+        scaled = np.empty(matrix.shape)
+        scaled[:, 0] = np.nan
+        scaled[:, 1:] = bn.move_std(matrix, self.vol_window, axis=1)[:, :-1] # known at the previous bar
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(1, scaled, out=scaled)
+            scaled[np.isinf(scaled)] = 0 # flat stream
+            scaled /= bn.nansum(scaled, axis=0)
+        missing = bn.anynan(scaled, axis=0)
+        scaled[:, missing] = fixed
+        return scaled
+
+    def run(self, weights: np.ndarray = None, benchmark_pct_changes: np.ndarray = None) -> Dict:
+        # Portfolio and per-stream metrics. benchmark_pct_changes (bar returns on the timeline, e.g. BTC) gives betas.
+        # Returns {"timestamps", "pnl" (portfolio bar pnl), "weights", "metrics" (portfolio),
+        # "stream_metrics" (name -> metrics), "correlation" (daily pnl correlation DataFrame)}
+        timeline, matrix = self.align()
+        stream_weights = self.weights(matrix, weights)
+        portfolio_pnl = np.einsum("ij,ij->j", np.broadcast_to(stream_weights, matrix.shape), matrix)
+
+        # the portfolio is row 0 of the metrics; the matrix itself is never copied
+        day_starts = evaluate.day_starts(timeline)
+        daily_pnl = np.vstack((evaluate.daily_sum(portfolio_pnl[None, :], day_starts), evaluate.daily_sum(matrix, day_starts)))
+        maximum_drawdown = np.concatenate((evaluate.compute_maximum_drawdowns(portfolio_pnl[None, :]), evaluate.compute_maximum_drawdowns(matrix)))
+        sharpe_ratio, calmar_ratio = evaluate.compute_ratios(daily_pnl, maximum_drawdown)
+        metrics = {"sharpe_ratio": sharpe_ratio, "calmar_ratio": calmar_ratio, "maximum_drawdown": maximum_drawdown}
+        if benchmark_pct_changes is not None:
+            metrics["beta"] = evaluate.compute_betas(daily_pnl, evaluate.daily_sum(np.atleast_2d(benchmark_pct_changes), day_starts))
+
+        return {
+            "timestamps": timeline,
+            "pnl": portfolio_pnl,
+            "weights": stream_weights,
+            "metrics": {key: values[0] for key, values in metrics.items()},
+            "stream_metrics": {name: {key: values[i + 1] for key, values in metrics.items()} for i, name in enumerate(self.names)},
+            "correlation": self.correlation(daily_pnl[1:])
+            }
+
+    def correlation(self, daily_pnl: np.ndarray) -> pd.DataFrame:
+        # Pearson correlation of the streams' daily pnl; a flat stream correlates with nothing (NaN)
+        deviation = daily_pnl - daily_pnl.mean(axis=1, keepdims=True)
+        norms = np.sqrt(np.einsum("ij,ij->i", deviation, deviation))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = (deviation @ deviation.T) / np.outer(norms, norms)
+        return pd.DataFrame(correlation, index=self.names, columns=self.names)
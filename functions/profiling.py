@@ -0,0 +1,150 @@
+import numpy as np
+import cProfile
+import functools
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+class _stage:
+    # Times one `with profile.stage(name):` block; arrays or DataFrames passed to allocated() count towards its bytes
+    __slots__ = ("profiler", "name", "nbytes", "start")
+
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.nbytes = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, time.perf_counter() - self.start, self.nbytes)
+        return False
+
+    def allocated(self, *arrays: np.ndarray):
+        for array in arrays:
+            if hasattr(array, "memory_usage"):
+                self.nbytes += int(array.memory_usage(index=False).sum())
+            else:
+                self.nbytes += getattr(array, "nbytes", 0)
+
+class _null_stage:
+    # Shared do-nothing stage handed out while profiling is off
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def allocated(self, *arrays: np.ndarray):
+        pass
+
+_null = _null_stage()
+
+class profiler:
+    # Opt-in stage timers for the sweep pipeline: wall time, call count and bytes allocated per named stage.
+    # Off unless the BACKTEST_PROFILE environment variable is set (to anything but "" or "0"); while off,
+    # stage() returns one shared no-op object, so instrumented code costs a method call per stage.
+    # Worker processes inherit the variable, and parallel_sweep merges their stage totals into the main
+    # process. With BACKTEST_PROFILE_OUTPUT=<path>, start() / finish() also write cProfile stats of the
+    # main process to <path> (set n_workers = 1 to have the whole sweep in it).
+
+    def __init__(self, enabled: bool = None, output: str = None):
+        if enabled is None:
+            enabled = os.environ.get("BACKTEST_PROFILE", "") not in ("", "0")
+        self.enabled = enabled
+        self.output = output if output is not None else os.environ.get("BACKTEST_PROFILE_OUTPUT") or None
+        self.stats = {}
+        self._profile = None
+        self._start = None
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _null
+        return _stage(self, name)
+
+    def timed(self, name: str):
+        # Decorator form of stage() for whole functions
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _stage(self, name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def start(self):
+        # Begin the run: wall clock for the summary, and cProfile when an output path is configured
+        if not self.enabled:
+            return
+        self._start = time.perf_counter()
+        if self.output:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def finish(self, top: int = 25) -> Dict[str, List[float]]:
+        # End the run: print the stage summary and write the cProfile stats; returns the stage totals
+        if not self.enabled:
+            return {}
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.output)
+            pstats.Stats(self.output).sort_stats("cumulative").print_stats(top)
+            print(f"cProfile stats written to {self.output}")
+            self._profile = None
+        print(self.report())
+        return self.snapshot()
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        # stage name -> [calls, seconds, bytes]
+        return {name: list(values) for name, values in self.stats.items()}
+
+    def merge(self, stats: Dict[str, List[float]]):
+        # Add stage totals recorded elsewhere, e.g. returned by a worker process
+        for name, (calls, seconds, nbytes) in stats.items():
+            self._record(name, seconds, nbytes, calls)
+
+    def reset(self):
+        self.stats = {}
+
+    @contextmanager
+    def collect(self):
+        # Record the enclosed stages apart from the running totals; the yielded dict receives them on exit
+        outer, self.stats = self.stats, {}
+        collected = {}
+        try:
+            yield collected
+        finally:
+            collected.update(self.stats)
+            self.stats = outer
+
+    def report(self) -> str:
+        # Stages sorted by total time. Worker time adds up across processes, so in a parallel run the
+        # stage totals can exceed the wall time.
+        lines = ["***************************************************************************************"]
+        if self._start is not None:
+            lines.append(f"wall time: {time.perf_counter() - self._start:.3f} s")
+        lines.append(f"{'stage':<32}{'calls':>10}{'total s':>12}{'mean ms':>12}{'MB':>12}")
+        for name, (calls, seconds, nbytes) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<32}{int(calls):>10}{seconds:>12.3f}{seconds / calls * 1000:>12.3f}{nbytes / 2**20:>12.1f}")
+        lines.append("***************************************************************************************")
+        return "\n".join(lines)
+
+    def _record(self, name: str, seconds: float, nbytes: int, calls: int = 1):
+        values = self.stats.get(name)
+        if values is None:
+            self.stats[name] = [calls, seconds, nbytes]
+        else:
+            values[0] += calls
+            values[1] += seconds
+            values[2] += nbytes
+
+# Process-wide profiler used by strategies, parallel_sweep, visualization and the scripts
+profile = profiler()
@@ -0,0 +1,122 @@
+import numpy as np
+import os
+from typing import Dict, List, Tuple
+from functions.evaluation import evaluation
+from functions.load_data import load_data
+from functions.profiling import profile
+
+evaluate = evaluation()
+
+# Bar length of every supported interval in epoch milliseconds (bars are aligned to the epoch, i.e. to UTC midnight)
+interval_ms = {"1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000, "1h": 3_600_000,
+               "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000, "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000}
+
+class resampler:
+    # Coarser bars derived from one stored base-interval dataset instead of a download and a cleaned CSV per interval.
+    # Columns are aggregated by name: price / open -> first, high -> max, low -> min, close -> last, volumes and
+    # trade counts -> sum, anything else (the on-chain variable) -> variable_how ("last" or "mean").
+    # Every target is built from the coarsest interval already built that divides it (1m -> 5m -> 15m -> 1h ...),
+    # with reduceat over bucket boundaries; means carry bar counts so they stay exact through the chain.
+    # Buckets that are missing base bars (a partial first bar, the still-open last bar, bars around a gap in the
+    # data) are dropped, so a bar's open price is always the price at its open time.
+    # Results are cached in load_data's layout (load_data.write_cache) and rebuilt when the base CSV changes.
+
+    def __init__(self, cache_folder: str = "cache", variable_how: str = "last"):
+        if variable_how not in ("last", "mean"):
+            raise ValueError(f"variable_how must be 'last' or 'mean', not {variable_how}")
+        self.cache_folder = cache_folder
+        self.variable_how = variable_how
+        self.ld = load_data(cache_folder)
+
+    def load_array(self, base_csv: str, base_interval: str, interval: str) -> np.ndarray:
+        # (N, 1 + k) float64 array of `interval` bars laid out like load_data.load_array of the base CSV,
+        # the read-only memory map of the cache file in load_data's layout
+        if interval == base_interval:
+            return self.ld.load_array(base_csv)
+        numpy_array, _ = self.ld.read_cache(self._cache_name(base_csv, interval), base_csv)
+        if numpy_array is None:
+            self.build(base_csv, base_interval, [interval])
+            numpy_array, _ = self.ld.read_cache(self._cache_name(base_csv, interval), base_csv)
+        return numpy_array
+
+    def build(self, base_csv: str, base_interval: str, intervals: List[str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        # Resample the base dataset to every interval in one pass down the chain and cache each result.
+        # Returns interval -> (int64 epoch ms bar open times, float64 values)
+        with profile.stage("resample") as stage:
+            timestamps, values, columns = self.ld.load_cleaned(base_csv)
+            rules = self.column_rules(columns[1:])
+            base_ms = interval_ms[base_interval]
+            # sums stand in for means until the end; counts are base bars per bar
+            level = (np.asarray(timestamps), np.asarray(values), np.ones(len(timestamps), dtype=np.int64), base_ms)
+            levels, results = [level], {}
+            for interval in sorted(set(intervals) - {base_interval}, key=lambda interval: interval_ms[interval]):
+                target_ms = interval_ms[interval]
+                if target_ms % base_ms:
+                    raise ValueError(f"{interval} is not a multiple of the base interval {base_interval}")
+                source = max((level for level in levels if target_ms % level[3] == 0), key=lambda level: level[3])
+                level = self._aggregate(*source[:3], rules, target_ms, target_ms // base_ms)
+                levels.append(level)
+                results[interval] = (level[0], self._finish(level[1], level[2], rules))
+                self._save_cached(base_csv, interval, *results[interval])
+                stage.allocated(*results[interval])
+        return results
+
+    def column_rules(self, columns: List[str]) -> List[str]:
+        # Aggregation of every value column (time column excluded), by column name
+        rules = []
+        for column in columns:
+            name = column.lower()
+            if name in ("price", "open"):
+                rules.append("first")
+            elif name == "high":
+                rules.append("max")
+            elif name == "low":
+                rules.append("min")
+            elif name == "close":
+                rules.append("last")
+            elif "volume" in name or "number of trades" in name:
+                rules.append("sum")
+            else:
+                rules.append(self.variable_how)
+        return rules
+
+    def _aggregate(self, timestamps: np.ndarray, values: np.ndarray, counts: np.ndarray, rules: List[str],
+                   target_ms: int, expected: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        # One level of the chain: bucket on the target bar open time and reduce every column at once per rule
+        keys = timestamps // target_ms
+        starts = evaluate.segment_starts(keys)
+        ends = np.append(starts[1:], len(keys)) - 1
+        out = np.empty((len(starts), values.shape[1]))
+        for rule in set(rules):
+            cols = [i for i, column_rule in enumerate(rules) if column_rule == rule]
+            if rule == "first":
+                out[:, cols] = values[starts][:, cols]
+            elif rule == "last":
+                out[:, cols] = values[ends][:, cols]
+            elif rule == "max":
+                out[:, cols] = np.maximum.reduceat(values[:, cols], starts, axis=0)
+            elif rule == "min":
+                out[:, cols] = np.minimum.reduceat(values[:, cols], starts, axis=0)
+            else: # sum, and mean as a sum until _finish
+                out[:, cols] = np.add.reduceat(values[:, cols], starts, axis=0)
+        bar_counts = np.add.reduceat(counts, starts)
+
+        # partial buckets: at the ends (before the first or after the last base bar) and around gaps in the data
+        keep = bar_counts == expected
+        return keys[starts][keep] * target_ms, out[keep], bar_counts[keep], target_ms
+
+    def _finish(self, values: np.ndarray, counts: np.ndarray, rules: List[str]) -> np.ndarray:
+        means = [i for i, rule in enumerate(rules) if rule == "mean"]
+        if means:
+            values = values.copy()
+            values[:, means] /= counts[:, None]
+        return values
+
+    def _cache_name(self, base_csv: str, interval: str) -> str:
+        return f"{os.path.splitext(os.path.basename(base_csv))[0]}.resampled_{interval}_{self.variable_how}"
+
+    def _save_cached(self, base_csv: str, interval: str, timestamps: np.ndarray, values: np.ndarray):
+        numpy_array = np.empty((len(timestamps), values.shape[1] + 1), dtype=np.float64)
+        numpy_array[:, 0] = timestamps
+        numpy_array[:, 1:] = values
+        self.ld.write_cache(self._cache_name(base_csv, interval), base_csv, numpy_array)
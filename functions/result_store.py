@@ -0,0 +1,135 @@
+import numpy as np
+import hashlib
+import sqlite3
+import os
+from typing import Dict, List, Optional, Tuple
+from functions.parallel import parallel_sweep
+from functions.strategy import strategies
+
+st = strategies()
+
+# Sources whose changes can change the numbers; their hash is part of every key
+_code_files = ["strategy.py", "accounting.py", "evaluation.py", "indicators.py"]
+
+class result_store:
+    # Persistent store of grid-cell results (SQLite), keyed by dataset hash, strategy, strategy direction,
+    # parameters, transaction_cost and code version. Sweeps only compute the cells that are missing and
+    # save each column as soon as it finishes, so an interrupted sweep resumes where it stopped.
+
+    def __init__(self, path: str = "results/results.db"):
+        self.path = path
+        self.metrics = list(st._empty_tables(0, 0).keys())
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        metric_columns = ", ".join(f"{metric} REAL" for metric in self.metrics)
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS results (
+                dataset_hash TEXT, strategy_name TEXT, strategy REAL, row_param REAL, col_param REAL,
+                transaction_cost REAL, code_version TEXT, {metric_columns},
+                PRIMARY KEY (dataset_hash, strategy_name, strategy, row_param, col_param, transaction_cost, code_version))""")
+        self.connection.commit()
+
+    def dataset_hash(self, float_array: np.ndarray) -> str:
+        return hashlib.blake2b(np.ascontiguousarray(float_array, dtype=np.float64).data, digest_size=16).hexdigest()
+
+    def code_version(self) -> str:
+        folder = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.blake2b(digest_size=8)
+        for file_name in _code_files:
+            with open(os.path.join(folder, file_name), "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def get(self, dataset_hash: str, strategy_name: str, transaction_cost: float, strategy: int,
+            row_params: np.ndarray, col_params: np.ndarray, code_version: str = None) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        # Stored tables for a grid (NaN where missing) and a boolean mask of the missing cells
+        code_version = code_version or self.code_version()
+        tables = {metric: np.full((len(row_params), len(col_params)), np.nan) for metric in self.metrics}
+        missing = np.ones((len(row_params), len(col_params)), dtype=bool)
+        row_index = {self._param(param): i for i, param in enumerate(row_params)}
+        col_index = {self._param(param): j for j, param in enumerate(col_params)}
+
+        cursor = self.connection.execute(
+            f"SELECT row_param, col_param, {', '.join(self.metrics)} FROM results "
+            "WHERE dataset_hash = ? AND strategy_name = ? AND strategy = ? AND transaction_cost = ? AND code_version = ?",
+            (dataset_hash, strategy_name, float(strategy), float(transaction_cost), code_version))
+        for row_param, col_param, *values in cursor:
+            i, j = row_index.get(row_param), col_index.get(col_param)
+            if i is None or j is None:
+                continue
+            missing[i, j] = False
+            for metric, value in zip(self.metrics, values):
+                tables[metric][i, j] = np.nan if value is None else value
+        return tables, missing
+
+    def put(self, dataset_hash: str, strategy_name: str, transaction_cost: float, strategy: int,
+            row_params: np.ndarray, col_param, columns: Dict[str, np.ndarray], code_version: str = None):
+        # Save one grid column (every row parameter of col_param)
+        code_version = code_version or self.code_version()
+        rows = [(dataset_hash, strategy_name, float(strategy), self._param(row_param), self._param(col_param),
+                 float(transaction_cost), code_version, *(self._value(columns[metric][i]) for metric in self.metrics))
+                for i, row_param in enumerate(row_params)]
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO results VALUES ({', '.join('?' * (7 + len(self.metrics)))})", rows)
+        self.connection.commit()
+
+    def sweep(self, sweep_runner: parallel_sweep, strategy_name: str, numpy_array: np.ndarray, test_ranges: List[Tuple[int, int]],
+              transaction_cost: float, strategy: int, row_params: np.ndarray, col_params: np.ndarray,
+              interval: str, masks: List[np.ndarray] = None) -> List[Dict[str, np.ndarray]]:
+        # Same inputs and output as parallel_sweep.run, but cells already in the store are not recomputed.
+        # Missing cells are grouped by column (and by which rows are missing) into parallel_sweep jobs.
+        # With masks, only the True cells are computed; stored cells are returned wherever they exist.
+        # compact results differ from float64 ones in the last digits, so they are stored apart
+        code_version = self.code_version() + ("-compact" if sweep_runner.compact else "")
+        float_array = sweep_runner.to_float_array(numpy_array)
+        results, jobs, job_meta = [], [], []
+        for test_no, (start, stop) in enumerate(test_ranges):
+            dataset_hash = self.dataset_hash(float_array[start:stop])
+            tables, missing = self.get(dataset_hash, strategy_name, transaction_cost, strategy, row_params, col_params, code_version)
+            results.append(tables)
+            if masks is not None:
+                missing &= masks[test_no]
+
+            for rows, cols in sweep_runner.group_cells(missing):
+                jobs.append((start, stop, strategy_name, transaction_cost, strategy,
+                             np.asarray(row_params)[rows], np.asarray(col_params)[cols], interval))
+                job_meta.append((test_no, dataset_hash, rows, cols))
+
+        def on_unit(job_no: int, j: int, columns: Dict[str, np.ndarray]):
+            test_no, dataset_hash, rows, cols = job_meta[job_no]
+            self.put(dataset_hash, strategy_name, transaction_cost, strategy, np.asarray(row_params)[rows], col_params[cols[j]], columns, code_version)
+            for key, values in columns.items():
+                results[test_no][key][rows, cols[j]] = values
+
+        n_cells = sum(len(rows) * len(cols) for _, _, rows, cols in job_meta)
+        n_requested = len(test_ranges) * len(row_params) * len(col_params) if masks is None else int(sum(mask.sum() for mask in masks))
+        print(f"{n_cells} of {n_requested} cells to compute, the rest from {self.path}")
+        if jobs:
+            sweep_runner.run_jobs(float_array, jobs, on_unit=on_unit)
+        return results
+
+    def best(self, dataset_hash: str, strategy_name: str, transaction_cost: float, strategy: int,
+             metric: str = "sharpe_ratio", code_version: str = None) -> Optional[Dict]:
+        # Stored cell with the highest `metric` for a dataset, or None if nothing is stored
+        code_version = code_version or self.code_version()
+        if metric not in self.metrics:
+            raise ValueError(f"Unknown metric: {metric}")
+        cursor = self.connection.execute(
+            f"SELECT row_param, col_param, {', '.join(self.metrics)} FROM results "
+            "WHERE dataset_hash = ? AND strategy_name = ? AND strategy = ? AND transaction_cost = ? AND code_version = ? "
+            f"AND {metric} IS NOT NULL ORDER BY {metric} DESC LIMIT 1",
+            (dataset_hash, strategy_name, float(strategy), float(transaction_cost), code_version))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip(["row_param", "col_param"] + self.metrics, row))
+
+    def _param(self, value) -> float:
+        # parameters are compared as rounded floats so 0.6 from np.arange and 0.6 from a literal match
+        return round(float(value), 10)
+
+    def _value(self, value) -> Optional[float]:
+        value = float(value)
+        return None if np.isnan(value) else value
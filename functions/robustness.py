@@ -0,0 +1,134 @@
+import numpy as np
+from typing import Dict, Tuple
+from functions.accounting import accounting
+from functions.evaluation import evaluation
+
+evaluate = evaluation()
+accounting_engine = accounting()
+
+# Metrics resampled by robustness; computed exactly as in evaluation.compute_metrics
+_metrics = ("sharpe_ratio", "calmar_ratio", "maximum_drawdown")
+
+class robustness:
+    # Is a backtest's Sharpe luck? Thousands of resamples of one strategy run, evaluated as batched 2D arrays
+    # (one row per resample) with the evaluation formulas of the sweep.
+    # bootstrap: circular block bootstrap of the pnl series, for confidence intervals of Sharpe, Calmar and
+    # maximum drawdown. Blocks of block_length bars (default n ** (1/3)) keep the short-range autocorrelation.
+    # A resample is only a list of block starts: running sums, drawdowns and daily sums are assembled from
+    # per-start block summaries computed once, so a resample costs O(blocks + days) instead of O(bars).
+    # permutation_test: random-entry test, the same positions circularly shifted to random start bars (same
+    # trades, holding times and long/short split, random timing); the p-value is the share of random entries
+    # doing at least as well.
+    # Resamples are processed in batches of at most max_elements values, so memory does not grow with n_resamples.
+
+    def __init__(self, n_resamples: int = 10_000, block_length: int = None, confidence: float = 0.95,
+                 max_elements: int = 1_000_000, seed: int = 0):
+        self.n_resamples = n_resamples
+        self.block_length = block_length
+        self.confidence = confidence
+        self.max_elements = max_elements
+        self.seed = seed
+
+    def bootstrap(self, pnl: np.ndarray, day_starts: np.ndarray = None) -> Dict[str, Dict[str, float]]:
+        # pnl is bar pnl with day_starts from evaluation.day_starts, or daily pnl (day_starts None).
+        # Resampled series keep the original day boundaries. Returns metric -> observed, mean, std, lower, upper.
+        pnl = np.asarray(pnl, dtype=np.float64)
+        n = len(pnl)
+        day_starts = np.arange(n) if day_starts is None else np.asarray(day_starts)
+        block_length = min(self.block_length or max(1, round(n ** (1 / 3))), n)
+        n_blocks = -(-n // block_length) # ceil
+        last_length = n - (n_blocks - 1) * block_length
+
+        # running sums of the series followed by its first block, so every circular block is a contiguous slice
+        cum_pnl = np.concatenate(([0], np.cumsum(np.concatenate((pnl, pnl[:block_length])))))
+        full_block = self._block_summaries(cum_pnl, n, block_length)
+        last_block = self._block_summaries(cum_pnl, n, last_length)
+        # every day boundary after the first as (block, offset) of the resampled series
+        boundaries = day_starts[1:]
+        boundary_blocks, boundary_offsets = boundaries // block_length, boundaries % block_length
+        rng = np.random.default_rng(self.seed)
+
+        def batch(n_rows: int) -> Dict[str, np.ndarray]:
+            starts = rng.integers(0, n, (n_rows, n_blocks))
+            summaries = [np.concatenate((full[starts[:, :-1]], last[starts[:, -1:]]), axis=1)
+                         for full, last in zip(full_block, last_block)]
+            totals, highest, lowest, drawdown = summaries
+            before = np.cumsum(totals, axis=1) - totals # sum of the earlier blocks
+            peak_before = np.maximum.accumulate(before + highest, axis=1)
+            maximum_drawdown = np.minimum(drawdown.min(axis=1), (before[:, 1:] + lowest[:, 1:] - peak_before[:, :-1]).min(axis=1, initial=0))
+
+            block_starts = starts[:, boundary_blocks]
+            cum_at_boundaries = before[:, boundary_blocks] + cum_pnl[block_starts + boundary_offsets] - cum_pnl[block_starts]
+            cum_at_boundaries = np.concatenate((np.zeros((n_rows, 1)), cum_at_boundaries, (before[:, -1] + totals[:, -1])[:, None]), axis=1)
+            sharpe_ratio, calmar_ratio = evaluate.compute_ratios(np.diff(cum_at_boundaries, axis=1), maximum_drawdown)
+            return {"sharpe_ratio": sharpe_ratio, "calmar_ratio": calmar_ratio, "maximum_drawdown": maximum_drawdown}
+
+        observed = {key: values[0] for key, values in self._evaluate(pnl[None, :], day_starts).items()}
+        samples = self._batched(batch, n_blocks + len(day_starts))
+        summary = {}
+        for key in _metrics:
+            lower, upper = np.nanpercentile(samples[key], [50 * (1 - self.confidence), 50 * (1 + self.confidence)])
+            summary[key] = {"observed": observed[key], "mean": np.nanmean(samples[key]), "std": np.nanstd(samples[key]),
+                            "lower": lower, "upper": upper}
+        return summary
+
+    def permutation_test(self, positions: np.ndarray, pct_changes: np.ndarray, transaction_cost: float,
+                         day_starts: np.ndarray) -> Dict[str, Dict[str, float]]:
+        # Bar positions and returns of one run (the "positions" and "pct_changes" columns of a strategy DataFrame).
+        # Returns metric -> observed, p_value and the mean / confidence bounds of the random entries.
+        positions = np.asarray(positions, dtype=np.float64)
+        pct_changes = np.asarray(pct_changes, dtype=np.float64)
+        n = len(positions)
+        # accounting.ledger of a shifted copy, as windows of the doubled circular previous positions and costs;
+        # the first bar of a shifted run has no previous position and pays for its whole entry
+        circular_prev = np.roll(positions, 1)
+        circular_costs = np.abs(positions - circular_prev) * transaction_cost
+        prev_windows = np.lib.stride_tricks.sliding_window_view(np.concatenate((circular_prev, circular_prev)), n)
+        cost_windows = np.lib.stride_tricks.sliding_window_view(np.concatenate((circular_costs, circular_costs)), n)
+        rng = np.random.default_rng(self.seed)
+
+        def batch(n_rows: int) -> Dict[str, np.ndarray]:
+            shifts = rng.integers(1, max(n, 2), n_rows) % n
+            pnl = prev_windows[shifts] * pct_changes - cost_windows[shifts]
+            pnl[:, 0] = -np.abs(positions[shifts]) * transaction_cost
+            return self._evaluate(pnl, day_starts)
+
+        _, _, _, pnl = accounting_engine.ledger(positions, pct_changes, transaction_cost)
+        observed = {key: values[0] for key, values in self._evaluate(pnl[None, :], day_starts).items()}
+        samples = self._batched(batch, n)
+        summary = {}
+        for key in _metrics:
+            null = samples[key][~np.isnan(samples[key])]
+            lower, upper = np.percentile(null, [50 * (1 - self.confidence), 50 * (1 + self.confidence)]) if len(null) else (np.nan, np.nan)
+            # higher is better for all three (maximum_drawdown is negative)
+            summary[key] = {"observed": observed[key], "p_value": (1 + np.sum(null >= observed[key])) / (1 + len(null)),
+                            "null_mean": np.mean(null) if len(null) else np.nan, "null_lower": lower, "null_upper": upper}
+        return summary
+
+    def _batched(self, batch, n: int) -> Dict[str, np.ndarray]:
+        # Run batch(n_rows) over n_resamples rows in chunks of at most max_elements values per array
+        rows_per_batch = max(1, self.max_elements // max(n, 1))
+        samples = {key: np.empty(self.n_resamples) for key in _metrics}
+        for start in range(0, self.n_resamples, rows_per_batch):
+            n_rows = min(rows_per_batch, self.n_resamples - start)
+            for key, values in batch(n_rows).items():
+                samples[key][start:start + n_rows] = values
+        return samples
+
+    def _block_summaries(self, cum_pnl: np.ndarray, n: int, length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # For a block of `length` bars at every start bar: its sum, highest and lowest running sum (from the
+        # block start) and its own maximum drawdown, in `length` vectorized passes over the n starts
+        highest = np.full(n, -np.inf)
+        lowest = np.full(n, np.inf)
+        drawdown = np.zeros(n)
+        for offset in range(length):
+            running = cum_pnl[offset + 1:offset + 1 + n] - cum_pnl[:n]
+            np.maximum(highest, running, out=highest)
+            np.minimum(lowest, running, out=lowest)
+            np.minimum(drawdown, running - highest, out=drawdown)
+        return cum_pnl[length:length + n] - cum_pnl[:n], highest, lowest, drawdown
+
+    def _evaluate(self, pnl: np.ndarray, day_starts: np.ndarray) -> Dict[str, np.ndarray]:
+        maximum_drawdown = evaluate.compute_maximum_drawdowns(pnl, self.max_elements)
+        sharpe_ratio, calmar_ratio = evaluate.compute_ratios(evaluate.daily_sum(pnl, day_starts), maximum_drawdown)
+        return {"sharpe_ratio": sharpe_ratio, "calmar_ratio": calmar_ratio, "maximum_drawdown": maximum_drawdown}
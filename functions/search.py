@@ -0,0 +1,87 @@
+import numpy as np
+from typing import Dict, List, Tuple
+from functions.parallel import parallel_sweep
+
+class parameter_search:
+    # Coarse-to-fine search over a fine (row parameter x column parameter) grid, instead of evaluating every cell.
+    # The first round evaluates every coarse_step-th row and column (the last row and column included). Each
+    # further round halves the step and evaluates the cells around the top_k cells so far (within one previous
+    # step in every direction), until the neighbourhoods of the best cells are evaluated at full resolution.
+    # Every round is one sweep over all test sets, through the result store when one is given (cached cells are
+    # read back, new ones persisted) or straight through parallel_sweep otherwise.
+    # Results are full-size tables with NaN in the cells that were never evaluated, so they go into
+    # visualization.generate_heatmap like exhaustive ones.
+
+    def __init__(self, sweep_runner: parallel_sweep, store=None, coarse_step: int = 8, top_k: int = 3, metric: str = "sharpe_ratio"):
+        self.sweep_runner = sweep_runner
+        self.store = store
+        self.coarse_step = coarse_step
+        self.top_k = top_k
+        self.metric = metric
+
+    def run(self, strategy_name: str, numpy_array: np.ndarray, test_ranges: List[Tuple[int, int]],
+            transaction_cost: float, strategy: int, row_params: np.ndarray, col_params: np.ndarray,
+            interval: str) -> Tuple[List[Dict[str, np.ndarray]], List[np.ndarray]]:
+        # Same inputs as parallel_sweep.run; returns one table dict per test set and one boolean mask per test set
+        # of the cells that were evaluated
+        n_rows, n_cols = len(row_params), len(col_params)
+        step = max(min(self.coarse_step, max(n_rows, n_cols) - 1), 1)
+        coarse = np.zeros((n_rows, n_cols), dtype=bool)
+        coarse[np.ix_(self._strided(n_rows, step), self._strided(n_cols, step))] = True
+        evaluated = [np.zeros((n_rows, n_cols), dtype=bool) for _ in test_ranges]
+        results = None
+        masks = [coarse.copy() for _ in test_ranges]
+
+        round_no = 0
+        while True:
+            masks = [mask & ~done for mask, done in zip(masks, evaluated)]
+            n_cells = int(sum(mask.sum() for mask in masks))
+            print(f"search round {round_no} (step {step}): {n_cells} cells")
+            if n_cells:
+                tables = self._sweep(strategy_name, numpy_array, test_ranges, transaction_cost, strategy, row_params, col_params, interval, masks)
+                results = tables if results is None else [self._merge(old, new, mask) for old, new, mask in zip(results, tables, masks)]
+                evaluated = [done | mask for done, mask in zip(evaluated, masks)]
+            if step == 1:
+                break
+            previous, step = step, max(step // 2, 1)
+            masks = [self._neighbourhoods(table[self.metric], done, previous, step) for table, done in zip(results, evaluated)]
+            round_no += 1
+
+        total = len(test_ranges) * n_rows * n_cols
+        n_evaluated = int(sum(done.sum() for done in evaluated))
+        print(f"search evaluated {n_evaluated} of {total} cells ({n_evaluated / total:.1%})")
+        return results, evaluated
+
+    def best(self, tables: Dict[str, np.ndarray], row_params: np.ndarray, col_params: np.ndarray) -> Dict:
+        # Parameters and metrics of the evaluated cell with the highest metric
+        values = np.where(np.isnan(tables[self.metric]), -np.inf, tables[self.metric])
+        i, j = np.unravel_index(np.argmax(values), values.shape)
+        return dict({"row_param": row_params[i], "col_param": col_params[j]},
+                    **{key: table[i, j] for key, table in tables.items()})
+
+    def _sweep(self, strategy_name, numpy_array, test_ranges, transaction_cost, strategy, row_params, col_params, interval, masks):
+        if self.store is not None:
+            return self.store.sweep(self.sweep_runner, strategy_name, numpy_array, test_ranges, transaction_cost, strategy,
+                                    row_params, col_params, interval, masks)
+        return self.sweep_runner.run(strategy_name, numpy_array, test_ranges, transaction_cost, strategy,
+                                     row_params, col_params, interval, masks)
+
+    def _merge(self, old: Dict[str, np.ndarray], new: Dict[str, np.ndarray], mask: np.ndarray) -> Dict[str, np.ndarray]:
+        # Newly evaluated cells over the earlier rounds; cells the store returned outside the mask fill gaps too
+        return {key: np.where(mask | np.isnan(old[key]), new[key], old[key]) for key in old}
+
+    def _neighbourhoods(self, values: np.ndarray, evaluated: np.ndarray, previous: int, step: int) -> np.ndarray:
+        # Cells at `step` spacing within `previous` cells of each of the top_k evaluated cells
+        mask = np.zeros(values.shape, dtype=bool)
+        scores = np.where(evaluated & ~np.isnan(values), values, -np.inf)
+        order = np.argsort(scores, axis=None)[::-1][:self.top_k]
+        for i, j in zip(*np.unravel_index(order, values.shape)):
+            if scores[i, j] == -np.inf:
+                break
+            rows = np.arange(max(i - previous, 0), min(i + previous, values.shape[0] - 1) + 1)
+            cols = np.arange(max(j - previous, 0), min(j + previous, values.shape[1] - 1) + 1)
+            mask[np.ix_(rows[(rows - i) % step == 0], cols[(cols - j) % step == 0])] = True
+        return mask
+
+    def _strided(self, n: int, step: int) -> np.ndarray:
+        return np.unique(np.append(np.arange(0, n, step), n - 1))
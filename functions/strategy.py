@@ -2,241 +2,312 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import numpy as np
-import bottleneck as bn
 import multiprocessing as mp
 from fractions import Fraction
 from scipy.ndimage import minimum_filter1d, maximum_filter1d
 from typing import Tuple, Dict
+from functions.accounting import accounting
 from functions.evaluation import evaluation
+from functions.indicators import indicators
+from functions.profiling import profile
 
 evaluate = evaluation()
+indicator_cache = indicators()
+accounting_engine = accounting()
 
-class strategies:
-    
-    def __init__(self):
-        variable = None
+# Registered signals by strategy_name; see strategies.register
+_signals = {}
 
-    def SMA_cross(self, numpy_array: np.ndarray, transaction_cost: float, strategy: int, shorter_period: int, longer_period: int, interval: str) -> Tuple[pd.DataFrame, Dict]:
-        # Change position when fast SMA crosses slow SMA
+# Row parameters whose positions are produced at once in compact mode (bounds the float64 stack of a signal)
+_compact_rows = 4
+
+# Documented tolerance of compact mode: largest relative difference from the float64 metrics
+# (sharpe_ratio, calmar_ratio, beta, maximum_drawdown); positions, trades and long_short_duration_ratio are exact
+compact_rtol = 1e-4
+
+class signal:
+    # A strategy is only its vectorized position rule; pnl, metrics, grids, parallel sweeps, walk-forward and the
+    # result store all go through the shared accounting engine. A strategy has two parameters: row_param (many
+    # values evaluated together as one 2D stack) and col_param (which sets the warm-up, e.g. a rolling period).
+    # Subclass it, fill in name / row_param / col_param and positions(), and register an instance with
+    # strategies().register(...) at import time (so worker processes started by spawn also know it).
+    name = None
+    row_param = None
+    col_param = None
+
+    def row_label(self) -> str:
+        # heatmap / table label of the row parameter values
+        return f"{self.row_param}s"
+
+    def col_label(self) -> str:
+        return f"{self.col_param}s"
+
+    def warm_up(self, col_param) -> int:
+        # Bars dropped from the start before the first position; by default a rolling window of col_param bars
+        return int(col_param) - 1
+
+    def indicators(self, variables: np.ndarray, col_param) -> Dict[str, np.ndarray]:
+        # Full-length series shared by every row parameter of a column (use indicator_cache for rolling stats)
+        return {}
 
+    def positions(self, indicators: Dict[str, np.ndarray], variables: np.ndarray, row_params: np.ndarray, col_param, strategy: int) -> np.ndarray:
+        # Full-length positions, one row per row parameter: (len(row_params), len(variables)).
+        # Values on warm-up bars are ignored.
+        raise NotImplementedError
+
+    def series(self, indicators: Dict[str, np.ndarray], variables: np.ndarray, row_param, col_param) -> Dict[str, np.ndarray]:
+        # Full-length extra columns of the debugging DataFrame of a single run (indicators, bands)
+        return {}
+
+class strategies:
+    # compact=True runs the accounting in int8 / float32 per-bar series (see accounting) for long histories;
+    # compact_errors measures how far its metrics are from the float64 ones.
+
+    def __init__(self, compact: bool = False):
+        self.compact = compact
+        self.accounting = accounting(compact) if compact else accounting_engine
+
+    def register(self, strategy_signal: signal):
+        # Make a signal available by name to run / grid, parallel_sweep, walk_forward and batch_runner
+        _signals[strategy_signal.name] = strategy_signal
+
+    def signal(self, strategy_name: str) -> signal:
+        if strategy_name not in _signals:
+            raise ValueError(f"Unknown strategy: {strategy_name}")
+        return _signals[strategy_name]
+
+    def run(self, strategy_name: str, numpy_array: np.ndarray, transaction_cost: float, strategy: int, row_param, col_param,
+            interval: str, metrics_only: bool = False) -> Tuple[pd.DataFrame, Dict]:
+        # One parameter set of a registered strategy: (debugging DataFrame, result dict).
+        # metrics_only=True skips the per-bar debugging series and the DataFrame, returning (None, result)
+        strategy_signal = self.signal(strategy_name)
         timestamps = numpy_array[:, 0]
         prices = numpy_array[:, 1].astype(float)
         variables = numpy_array[:, 2].astype(float)
-        shorter_ma = bn.move_mean(variables, window=shorter_period)
-        longer_ma = bn.move_mean(variables, window=longer_period)
-        timestamps = timestamps[longer_period - 1:]
-        prices = prices[longer_period - 1:]
-        variables = variables[longer_period - 1:]
-        shorter_ma = shorter_ma[longer_period - 1:]
-        longer_ma = longer_ma[longer_period - 1:]
-
-        positions = np.where(shorter_ma > longer_ma, strategy, -strategy)
-
-        prev_positions = np.zeros_like(prices)
-        prev_positions[1:] = positions[:-1]
-
-        pct_changes = np.concatenate((np.array([0]), np.diff(prices) / prices[:-1]))
-        price_changes = np.concatenate((np.array([0]), np.diff(prices)))
-
-        trades = positions - np.concatenate((np.array([0]), positions[:-1]))
-        costs = np.abs(trades) * transaction_cost
-
-        earnings = prev_positions * price_changes - costs * prices
-        pnl = prev_positions * pct_changes - costs
-        cum_pnl = np.cumsum(pnl)
-        drawdowns = cum_pnl - np.maximum.accumulate(cum_pnl)
-        underlying_cumu = np.cumsum(pct_changes)
-        underlying_dd = underlying_cumu - np.maximum.accumulate(underlying_cumu)
-
-        short = np.sum(trades < 0)
-        long = np.sum(trades > 0)
-        n_trade = long + short
-        long_short_duration_ratio = np.sum(positions > 0) / np.sum(positions < 0)
-
-        mapping = {
-            "1m": 24 * 60,
-            "5m": 24 * 12,
-            "15m": 24 * 4,
-            "30m": 24 * 2,
-            "1h": 24
-        }
-        count = mapping.get(interval, 1)
-
-        # Calculate the number of complete blocks
-        num_complete_blocks = len(pnl) // count
-
-        sums_of_complete_blocks = np.sum(pnl[:num_complete_blocks * count].reshape(-1, count), axis=1)
-        remaining_sum = np.sum(pnl[num_complete_blocks * count:]) if num_complete_blocks * count < len(pnl) else []
-        strategy_daily_pnl = np.concatenate([sums_of_complete_blocks, remaining_sum])
-
-        sums_of_complete_blocks = np.sum(pct_changes[:num_complete_blocks * count].reshape(-1, count), axis=1)
-        remaining_sum = np.sum(pct_changes[num_complete_blocks * count:]) if num_complete_blocks * count < len(pct_changes) else []
-        asset_daily_pct_change = np.concatenate([sums_of_complete_blocks, remaining_sum])
-
-        sharpe_ratio = evaluate.compute_sharpe_ratio(strategy_daily_pnl)
-        calmar_ratio = evaluate.compute_calmar_ratio(strategy_daily_pnl)
-        beta = evaluate.compute_beta(strategy_daily_pnl, asset_daily_pct_change)
-        maximum_drawdown = evaluate.compute_maximum_drawdown(pnl)
-
-        df = pd.DataFrame({
-            'timestamp': timestamps,
-            'prices': prices,
-            'variables': variables,
-            'shorter_ma': shorter_ma,
-            'longer_ma': longer_ma,
-            'positions': positions,
-            'pct_changes': pct_changes,
-            'price_changes': price_changes,
-            'trades': trades,
-            'costs': costs,
-            'earnings': earnings,
-            'pnl': pnl,
-            'cum_pnl': cum_pnl,
-            'drawdowns': drawdowns,
-            'underlying_cumu': underlying_cumu,
-            'underlying_dd': underlying_dd
-            })
-
-        result = {
-            "shorter_period": shorter_period,
-            "longer_period": longer_period,        
-            "sharpe_ratio": sharpe_ratio,
-            "calmar_ratio": calmar_ratio,
-            "maximum_drawdown": maximum_drawdown,
-            "long_short_duration_ratio": long_short_duration_ratio,
-            "number_of_trades": n_trade
-            }
+        warm_up = strategy_signal.warm_up(col_param)
+
+        with profile.stage(f"{strategy_name}.rolling_stats"):
+            indicators = strategy_signal.indicators(variables, col_param)
+        with profile.stage(f"{strategy_name}.positions") as stage:
+            positions = self._positions(strategy_signal, indicators, variables, np.array([row_param]), col_param, strategy, warm_up)[0]
+            stage.allocated(positions)
+
+        timestamps = timestamps[warm_up:]
+        prices = prices[warm_up:]
+        variables = variables[warm_up:]
+        pct_changes = self.accounting.pct_changes(prices)
+
+        # daily pnl is bucketed on the bars' UTC days, so gaps and any interval are handled
+        metrics = self.accounting.metrics(positions, pct_changes, transaction_cost, evaluate.day_starts(timestamps))
+        result = dict({strategy_signal.row_param: row_param, strategy_signal.col_param: col_param}, **metrics)
+
+        if metrics_only:
+            return None, result
 
+        series = strategy_signal.series(indicators, numpy_array[:, 2].astype(float), row_param, col_param)
+        df = self.accounting.frame(timestamps, prices, variables, {key: values[warm_up:] for key, values in series.items()},
+                                     positions, pct_changes, transaction_cost)
         return df, result
 
-    def bband(self, numpy_array: np.ndarray, transaction_cost: float, strategy: int, z_thresh: float, rolling_period: int, interval: str) -> Tuple[pd.DataFrame, Dict]:
-        # Let x be the moving average of a variable, z_th be the z-score threshold, std be the standard deviation.
-        # Construct upper band (x + z_th  * std), middle band (x), and lower band (x - z_th * std).
-        # Enter when the variable crosses upper band or lower band. Exit when the variable crosses middle band.
-        timestamps = numpy_array[:, 0]
+    def grid(self, strategy_name: str, numpy_array: np.ndarray, transaction_cost: float, strategy: int,
+             row_params: np.ndarray, col_params: np.ndarray, interval: str) -> Dict[str, np.ndarray]:
+        # Evaluate every (row_param, col_param) cell of a registered strategy.
+        # Price-side series are computed once, the indicators once per column, and all row parameters of a
+        # column are accounted for as one 2D stack of positions.
+        # Returns tables of shape (len(row_params), len(col_params)) keyed like the result dict; columns whose
+        # warm-up covers the whole series (windows in bars longer than a coarse interval's data) are NaN.
+        strategy_signal = self.signal(strategy_name)
+        day_keys = evaluate.bucket_keys(numpy_array[:, 0])
         prices = numpy_array[:, 1].astype(float)
         variables = numpy_array[:, 2].astype(float)
+        pct_changes_full = self.accounting.pct_changes(prices)
+
+        tables = self._empty_tables(len(row_params), len(col_params))
+        for j, col_param in enumerate(col_params):
+            warm_up = strategy_signal.warm_up(col_param)
+            if warm_up >= len(variables): # window longer than the data, e.g. a daily resample of an hourly grid
+                for values in tables.values():
+                    values[:, j] = np.nan
+                continue
+            with profile.stage(f"{strategy_name}_grid.rolling_stats"):
+                indicators = strategy_signal.indicators(variables, col_param)
+            with profile.stage(f"{strategy_name}_grid.positions") as stage:
+                positions = self._positions(strategy_signal, indicators, variables, row_params, col_param, strategy, warm_up)
+                stage.allocated(positions)
+
+            metrics = self.accounting.metrics(positions, self.accounting.window_pct_changes(pct_changes_full, warm_up), transaction_cost,
+                                              evaluate.segment_starts(day_keys[warm_up:]))
+            for key, values in metrics.items():
+                tables[key][:, j] = values
+
+        return tables
+
+    def cost_grid(self, strategy_name: str, numpy_array: np.ndarray, transaction_costs: np.ndarray, strategy: int,
+                  row_params: np.ndarray, col_params: np.ndarray, interval: str, slippage: np.ndarray = None) -> Dict[str, np.ndarray]:
+        # grid() for a vector of fee levels in one pass: the positions of every cell are computed once and all fee
+        # levels are accounted for from them (see accounting.cost_metrics). slippage is an optional per-bar rate of
+        # the whole numpy_array, e.g. accounting.volume_slippage of its volume column.
+        # Returns tables of shape (len(transaction_costs), len(row_params), len(col_params)).
+        strategy_signal = self.signal(strategy_name)
+        day_keys = evaluate.bucket_keys(numpy_array[:, 0])
+        prices = numpy_array[:, 1].astype(float)
+        variables = numpy_array[:, 2].astype(float)
+        pct_changes_full = self.accounting.pct_changes(prices)
+
+        tables = {key: np.full((len(transaction_costs),) + values.shape, np.nan)
+                  for key, values in self._empty_tables(len(row_params), len(col_params)).items()}
+        for j, col_param in enumerate(col_params):
+            warm_up = strategy_signal.warm_up(col_param)
+            if warm_up >= len(variables): # stays NaN
+                continue
+            with profile.stage(f"{strategy_name}_cost_grid.rolling_stats"):
+                indicators = strategy_signal.indicators(variables, col_param)
+            with profile.stage(f"{strategy_name}_cost_grid.positions") as stage:
+                positions = self._positions(strategy_signal, indicators, variables, row_params, col_param, strategy, warm_up)
+                stage.allocated(positions)
+
+            metrics = self.accounting.cost_metrics(positions, self.accounting.window_pct_changes(pct_changes_full, warm_up), transaction_costs,
+                                                   evaluate.segment_starts(day_keys[warm_up:]), None if slippage is None else slippage[warm_up:])
+            for key, values in metrics.items():
+                tables[key][:, :, j] = values
+
+        return tables
+
+    def compact_errors(self, strategy_name: str, numpy_array: np.ndarray, transaction_cost: float, strategy: int,
+                       row_params: np.ndarray, col_params: np.ndarray, interval: str) -> Dict[str, float]:
+        # Largest relative difference of every metric between a compact and a float64 grid over the same data
+        # (absolute where the float64 value is 0; cells that are NaN in both are skipped). Compare with compact_rtol.
+        compact_tables = strategies(compact=True).grid(strategy_name, numpy_array, transaction_cost, strategy, row_params, col_params, interval)
+        full_tables = strategies().grid(strategy_name, numpy_array, transaction_cost, strategy, row_params, col_params, interval)
+        errors = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for key, full in full_tables.items():
+                difference = np.abs(compact_tables[key] - full)
+                relative = np.where(full != 0, difference / np.abs(full), difference)
+                relative = np.where(np.isnan(full) & np.isnan(compact_tables[key]), 0, relative)
+                errors[key] = float(np.max(np.where(np.isnan(relative), np.inf, relative), initial=0))
+        return errors
+
+    def column_positions(self, strategy_name: str, variables: np.ndarray, strategy: int, row_params: np.ndarray, col_param) -> np.ndarray:
+        # Full-length positions for every row parameter of one column, flat on the warm-up bars
+        strategy_signal = self.signal(strategy_name)
+        if strategy_signal.warm_up(col_param) >= len(variables):
+            return np.zeros((len(row_params), len(variables)))
+        positions = strategy_signal.positions(strategy_signal.indicators(variables, col_param), variables, row_params, col_param, strategy).astype(float)
+        positions[:, :strategy_signal.warm_up(col_param)] = 0
+        return positions
+
+    def SMA_cross(self, numpy_array: np.ndarray, transaction_cost: float, strategy: int, shorter_period: int, longer_period: int, interval: str, metrics_only: bool = False) -> Tuple[pd.DataFrame, Dict]:
+        # Change position when fast SMA crosses slow SMA
+        # metrics_only=True skips the per-bar debugging series and the DataFrame, returning (None, result)
+        return self.run("SMA_cross", numpy_array, transaction_cost, strategy, shorter_period, longer_period, interval, metrics_only)
 
-        mapping = {
-            "1m": 24 * 60,
-            "5m": 24 * 12,
-            "15m": 24 * 4,
-            "30m": 24 * 2,
-            "1h": 24
-        }
-        count = mapping.get(interval, 1)
+    def bband_positions(self, z_scores: np.ndarray, z_thresh: float, strategy: int) -> np.ndarray:
+        # enter / hold / exit rules of bband for one threshold, see bband_signal.hysteresis
+        return self.signal("bband").hysteresis(z_scores, z_thresh, strategy)
 
-        period = int(rolling_period)
-        sma = bn.move_mean(variables, window=period)
-        std = np.sqrt(bn.move_var(variables, window=period))
+    def bband(self, numpy_array: np.ndarray, transaction_cost: float, strategy: int, z_thresh: float, rolling_period: int, interval: str, metrics_only: bool = False) -> Tuple[pd.DataFrame, Dict]:
+        # Let x be the moving average of a variable, z_th be the z-score threshold, std be the standard deviation.
+        # Construct upper band (x + z_th  * std), middle band (x), and lower band (x - z_th * std).
+        # Enter when the variable crosses upper band or lower band. Exit when the variable crosses middle band.
+        # metrics_only=True skips the per-bar debugging series and the DataFrame, returning (None, result)
+        return self.run("bband", numpy_array, transaction_cost, strategy, z_thresh, rolling_period, interval, metrics_only)
+
+    def bband_grid(self, numpy_array: np.ndarray, transaction_cost: float, strategy: int, z_threshes: np.ndarray, rolling_periods: np.ndarray, interval: str) -> Dict[str, np.ndarray]:
+        # Every (z_thresh, rolling_period) cell of bband; the rolling statistics of a window are shared by all thresholds
+        return self.grid("bband", numpy_array, transaction_cost, strategy, z_threshes, rolling_periods, interval)
+
+    def SMA_cross_grid(self, numpy_array: np.ndarray, transaction_cost: float, strategy: int, shorter_periods: np.ndarray, longer_periods: np.ndarray, interval: str) -> Dict[str, np.ndarray]:
+        # Every (shorter_period, longer_period) cell of SMA_cross; each distinct moving average is computed once
+        return self.grid("SMA_cross", numpy_array, transaction_cost, strategy, shorter_periods, longer_periods, interval)
+
+    def _positions(self, strategy_signal: signal, indicators: Dict[str, np.ndarray], variables: np.ndarray, row_params: np.ndarray,
+                   col_param, strategy: int, warm_up: int) -> np.ndarray:
+        # Positions after the warm-up, one row per row parameter. In compact mode they are built a few rows at a time
+        # straight into an int8 stack, so the signal's float64 rows never exist for the whole grid column at once.
+        if not self.compact:
+            return strategy_signal.positions(indicators, variables, row_params, col_param, strategy)[:, warm_up:]
+        positions = np.empty((len(row_params), len(variables) - warm_up), dtype=np.int8)
+        for start in range(0, len(row_params), _compact_rows):
+            rows = strategy_signal.positions(indicators, variables, row_params[start:start + _compact_rows], col_param, strategy)
+            positions[start:start + _compact_rows] = self.accounting.compact_positions(rows[:, warm_up:])
+        return positions
+
+    def _empty_tables(self, n_rows: int, n_cols: int) -> Dict[str, np.ndarray]:
+        keys = ["sharpe_ratio", "calmar_ratio", "beta", "maximum_drawdown", "long_short_duration_ratio", "number_of_trades"]
+        return {key: np.zeros((n_rows, n_cols)) for key in keys}
+
+class bband_signal(signal):
+    # Bollinger band on the variable: enter beyond +-z_thresh standard deviations, exit at the middle band
+    name = "bband"
+    row_param = "z_thresh"
+    col_param = "rolling_period"
+
+    def row_label(self) -> str:
+        return "z_threshes"
+
+    def indicators(self, variables: np.ndarray, col_param) -> Dict[str, np.ndarray]:
+        period = int(col_param)
+        sma = indicator_cache.move_mean(variables, period)
+        std = indicator_cache.move_std(variables, period)
+        return {"sma": sma, "std": std, "z_scores": (variables - sma) / std}
+
+    def positions(self, indicators: Dict[str, np.ndarray], variables: np.ndarray, row_params: np.ndarray, col_param, strategy: int) -> np.ndarray:
+        return np.stack([self.hysteresis(indicators["z_scores"], z_thresh, strategy) for z_thresh in row_params])
+
+    def series(self, indicators: Dict[str, np.ndarray], variables: np.ndarray, row_param, col_param) -> Dict[str, np.ndarray]:
+        sma, std = indicators["sma"], indicators["std"]
+        return {"sma": sma, "upper_band": sma + row_param * std, "lower_band": sma - row_param * std}
+
+    def hysteresis(self, z_scores: np.ndarray, z_thresh: float, strategy: int) -> np.ndarray:
+        # Vectorized enter / hold / exit hysteresis of bband, bar-for-bar identical to the loop:
+        #   z >= z_thresh               -> enter  strategy
+        #   z <= -z_thresh              -> enter -strategy
+        #   z > 0 after an upper entry  -> hold   strategy
+        #   z < 0 after a lower entry   -> hold  -strategy
+        #   otherwise (incl. z == 0, NaN) -> flat until the next entry
+        # A position survives from its entry bar as long as no "break" bar (z not on the entry side)
+        # has occurred since, so cumulative break counts replace the per-bar state.
+        z_scores = np.asarray(z_scores, dtype=float)
+        n = len(z_scores)
+        index = np.arange(n)
+
+        upper_entry = z_scores >= z_thresh
+        lower_entry = (z_scores <= -z_thresh) & ~upper_entry
+        entry_side = upper_entry.astype(np.int8) - lower_entry.astype(np.int8)
+
+        last_entry = np.maximum.accumulate(np.where(entry_side != 0, index, -1))
+        has_entry = last_entry >= 0
+        last_entry = np.where(has_entry, last_entry, 0)
+        side = np.where(has_entry, entry_side[last_entry], 0)
+
+        upper_breaks = np.cumsum(~(z_scores > 0))
+        lower_breaks = np.cumsum(~(z_scores < 0))
+        breaks = np.where(side > 0,
+                          upper_breaks - upper_breaks[last_entry],
+                          lower_breaks - lower_breaks[last_entry])
 
-        timestamps = timestamps[period - 1:]
-        sma = sma[period - 1:]
-        std = std[period - 1:]
-        prices = prices[period - 1:]
-        variables = variables[period - 1:]
+        positions = np.zeros_like(z_scores)
+        held = (side != 0) & (breaks == 0)
+        positions[held] = side[held] * strategy
+        return positions
 
-        z_scores = (variables - sma) / std
+class SMA_cross_signal(signal):
+    # Long (strategy) while the shorter moving average is above the longer one, short (-strategy) otherwise
+    name = "SMA_cross"
+    row_param = "shorter_period"
+    col_param = "longer_period"
 
-        upper_band = sma + z_thresh * std
-        lower_band = sma - z_thresh * std
+    def indicators(self, variables: np.ndarray, col_param) -> Dict[str, np.ndarray]:
+        return {"longer_ma": indicator_cache.move_mean(variables, int(col_param))}
 
-        position = 0
-        positions = np.zeros_like(z_scores)
-        
-        for y, z in enumerate(z_scores):
-            if z >= z_thresh:
-                positions[y] = strategy
-                position = strategy
-            elif z <= -z_thresh:
-                positions[y] = -strategy
-                position = -strategy
-            elif z > 0 and position == strategy:
-                positions[y] = position
-            elif z < 0 and position == -strategy:
-                positions[y] = position
-            else:
-                positions[y] = 0
-                position = 0
-        
-        prev_positions = np.zeros_like(prices)
-        prev_positions[1:] = positions[:-1]
-
-        pct_changes = np.concatenate((np.array([0]), np.diff(prices) / prices[:-1]))
-        price_changes = np.concatenate((np.array([0]), np.diff(prices)))
-
-        trades = positions - np.concatenate((np.array([0]), positions[:-1]))
-        costs = np.abs(trades) * transaction_cost
-
-        earnings = prev_positions * price_changes - costs * prices
-        pnl = prev_positions * pct_changes - costs
-        cum_pnl = np.cumsum(pnl)
-        drawdowns = cum_pnl - np.maximum.accumulate(cum_pnl)
-        underlying_cumu = np.cumsum(pct_changes)
-        underlying_dd = underlying_cumu - np.maximum.accumulate(underlying_cumu)
-
-        short = np.sum(trades < 0)
-        long = np.sum(trades > 0)
-        n_trade = long + short
-        long_short_duration_ratio = np.sum(positions > 0) / np.sum(positions < 0)
-
-        mapping = {
-            "1m": 24 * 60,
-            "5m": 24 * 12,
-            "15m": 24 * 4,
-            "30m": 24 * 2,
-            "1h": 24
-        }
-        count = mapping.get(interval, 1)
-
-        # Calculate the number of complete blocks
-        num_complete_blocks = len(pnl) // count
-
-        strategy_daily_pnl = pnl[:num_complete_blocks * count].reshape(-1, count).sum(axis=1)
-        sums_of_complete_blocks = np.sum(pnl[:num_complete_blocks * count].reshape(-1, count), axis=1)
-        remaining_items = pnl[num_complete_blocks * count:]
-        sums_of_remaining = remaining_items.sum() if remaining_items.size > 0 else np.array([])
-        strategy_daily_pnl = np.concatenate((strategy_daily_pnl, [sums_of_remaining]))
-
-        asset_daily_pct_change = pct_changes[:num_complete_blocks * count].reshape(-1, count).sum(axis=1)
-        sums_of_complete_blocks = np.sum(pct_changes[:num_complete_blocks * count].reshape(-1, count), axis=1)
-        remaining_items = pct_changes[num_complete_blocks * count:]
-        sums_of_remaining = remaining_items.sum() if remaining_items.size > 0 else np.array([])
-        asset_daily_pct_change = np.concatenate((asset_daily_pct_change, [sums_of_remaining]))
-
-        sharpe_ratio = evaluate.compute_sharpe_ratio(strategy_daily_pnl)
-        beta = evaluate.compute_beta(strategy_daily_pnl, asset_daily_pct_change)
-        maximum_drawdown = evaluate.compute_maximum_drawdown(pnl)
-        calmar_ratio = evaluate.compute_calmar_ratio(strategy_daily_pnl, maximum_drawdown)
-
-        df = pd.DataFrame({
-            'timestamps': timestamps,
-            'prices': prices,
-            'variables': variables,
-            'sma': sma,
-            'upper_band': upper_band,
-            'lower_band': lower_band,
-            'positions': positions,
-            'pct_changes': pct_changes,
-            'price_changes': price_changes,
-            'trades': trades,
-            'costs': costs,
-            'earnings': earnings,
-            'pnl': pnl,
-            'cum_pnl': cum_pnl,
-            'drawdowns': drawdowns,
-            'underlying_cumu': underlying_cumu,
-            'underlying_dd': underlying_dd
-            })
-
-        result = {
-            'rolling_period': rolling_period,
-            'z_thresh': z_thresh,     
-            "sharpe_ratio": sharpe_ratio,
-            "calmar_ratio": calmar_ratio,
-            "maximum_drawdown": maximum_drawdown,
-            "long_short_duration_ratio": long_short_duration_ratio,
-            "number_of_trades": n_trade
-            }
+    def positions(self, indicators: Dict[str, np.ndarray], variables: np.ndarray, row_params: np.ndarray, col_param, strategy: int) -> np.ndarray:
+        longer_ma = indicators["longer_ma"]
+        return np.stack([np.where(indicator_cache.move_mean(variables, int(shorter_period)) > longer_ma, strategy, -strategy)
+                         for shorter_period in row_params])
 
-        return df, result
+    def series(self, indicators: Dict[str, np.ndarray], variables: np.ndarray, row_param, col_param) -> Dict[str, np.ndarray]:
+        return {"shorter_ma": indicator_cache.move_mean(variables, int(row_param)), "longer_ma": indicators["longer_ma"]}
+
+strategies().register(bband_signal())
+strategies().register(SMA_cross_signal())
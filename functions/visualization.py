@@ -1,67 +1,87 @@
-from typing import Tuple
+from typing import Dict, List, Tuple
 import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+import multiprocessing as mp
 from matplotlib.ticker import FormatStrFormatter
+from matplotlib.collections import PolyCollection
+from functions.profiling import profile
+
+def _render_heatmap(job: Dict) -> Tuple[str, Dict]:
+    # Worker side of visualization.save_heatmaps: draw, save and close one heatmap figure
+    plt.switch_backend("Agg")
+    vi = visualization(job["max_points"], job["annotate_max_cells"])
+    with profile.collect() as stats:
+        fig = vi.generate_heatmap(*job["tables"], job["xticklabels"], job["yticklabels"], job["xlabel"], job["ylabel"])
+        with profile.stage("render.save"):
+            fig.savefig(job["save_path"], dpi=job["dpi"])
+        plt.close(fig)
+    return job["save_path"], stats
 
 class visualization:
+    # max_points: line and bar series longer than this are decimated (min/max per bucket) before plotting.
+    # annotate_max_cells: heatmaps with more cells than this are drawn without the per-cell numbers.
+
+    def __init__(self, max_points: int = 4000, annotate_max_cells: int = 400):
+        self.max_points = max_points
+        self.annotate_max_cells = annotate_max_cells
     
-    def __init__(self):
-        variable = None
-    
+    @profile.timed("render.heatmap")
     def generate_heatmap(self, sharpe_table: np.ndarray, calmar_table: np.ndarray, 
                          n_trade_table: np.ndarray, long_short_duration_ratio_table: np.ndarray,
                          xticklabels: np.ndarray, yticklabels: np.ndarray, 
                          xlabel: str, ylabel: str) -> plt.Figure:
         sns.set_theme(style="whitegrid")
         fig, ax = plt.subplots(ncols=2, nrows=2, figsize=(26, 13))
+        # cell numbers are unreadable (and slow to lay out) on large grids
+        annotate = sharpe_table.size <= self.annotate_max_cells
 
-        sns.heatmap(sharpe_table.round(2), vmin=-2, vmax=3.5, ax=ax[0,0], cmap="coolwarm_r", annot=True, center=1, fmt='.2f', annot_kws={'size': 10}, xticklabels=xticklabels, yticklabels=yticklabels)
+        sns.heatmap(sharpe_table.round(2), vmin=-2, vmax=3.5, ax=ax[0,0], cmap="coolwarm_r", annot=annotate, center=1, fmt='.2f', annot_kws={'size': 10}, xticklabels=xticklabels, yticklabels=yticklabels)
         ax[0,0].set_title(f'Sharpe ratio heatmap', fontsize=12)
         ax[0,0].set_ylabel(ylabel)
         ax[0,0].set_xlabel(xlabel)
+        # seaborn draws the whole figure inside every heatmap call; finished panels are hidden until the end
+        # so each call only pays for its own panel
+        ax[0,0].set_visible(False)
 
-        sns.heatmap(calmar_table.round(2), vmin=0, vmax=10, ax=ax[0,1], cmap="coolwarm_r", annot=True, center=2, fmt='.2f', annot_kws={'size': 10}, xticklabels=xticklabels, yticklabels=yticklabels)
+        sns.heatmap(calmar_table.round(2), vmin=0, vmax=10, ax=ax[0,1], cmap="coolwarm_r", annot=annotate, center=2, fmt='.2f', annot_kws={'size': 10}, xticklabels=xticklabels, yticklabels=yticklabels)
         ax[0,1].set_title(f'Calmar ratio heatmap', fontsize=12)
         ax[0,1].set_ylabel(ylabel)
         ax[0,1].set_xlabel(xlabel)
+        ax[0,1].set_visible(False)
 
-        sns.heatmap(n_trade_table.round(2), vmin=0, vmax=2000, ax=ax[1,0], cmap="coolwarm_r", annot=True, center=800, fmt='.2f', annot_kws={'size': 10}, xticklabels=xticklabels, yticklabels=yticklabels)
+        sns.heatmap(n_trade_table.round(2), vmin=0, vmax=2000, ax=ax[1,0], cmap="coolwarm_r", annot=annotate, center=800, fmt='.2f', annot_kws={'size': 10}, xticklabels=xticklabels, yticklabels=yticklabels)
         ax[1,0].set_title(f'No. of trades heatmap', fontsize=12)
         ax[1,0].set_ylabel(ylabel)
         ax[1,0].set_xlabel(xlabel)
+        ax[1,0].set_visible(False)
 
-        sns.heatmap(long_short_duration_ratio_table.round(2), vmin=0, vmax=2, ax=ax[1,1], cmap="coolwarm_r", annot=True, center=1.5, fmt='.2f', annot_kws={'size': 10}, xticklabels=xticklabels, yticklabels=yticklabels)
+        sns.heatmap(long_short_duration_ratio_table.round(2), vmin=0, vmax=2, ax=ax[1,1], cmap="coolwarm_r", annot=annotate, center=1.5, fmt='.2f', annot_kws={'size': 10}, xticklabels=xticklabels, yticklabels=yticklabels)
         ax[1,1].set_title(f'Long Short Duration Ratio heatmap', fontsize=12)
         ax[1,1].set_ylabel(ylabel)
         ax[1,1].set_xlabel(xlabel)
 
+        for panel in ax.flat:
+            panel.set_visible(True)
         fig.tight_layout()
         
         #plt.show()
 
         return fig
 
+    @profile.timed("render.equity_curve")
     def generate_equity_curve(self, df: pd.DataFrame, title: str, ylabel: str, xlabel: str) -> plt.Figure:
         fig, ax = plt.subplots(figsize=(12, 8))
 
         # Plot both series on the same y-axis
-        ax.plot(df["timestamps"], df["cum_pnl"], color='red', label="Strategy Cumulative PnL")
-        ax.plot(df["timestamps"], df["underlying_cumu"], color='black', label="Buy-and-Hold Cumulative PnL")
+        ax.plot(*self.decimate(df["timestamps"], df["cum_pnl"]), color='red', label="Strategy Cumulative PnL")
+        ax.plot(*self.decimate(df["timestamps"], df["underlying_cumu"]), color='black', label="Buy-and-Hold Cumulative PnL")
 
         ax.set_ylabel(ylabel)
         ax.set_xlabel(xlabel)
 
-        unique_timestamps = df["timestamps"].unique()
-        tick_indices = [i for i, x in enumerate(df["timestamps"]) if x in unique_timestamps]
-
-        num_ticks = 5
-        tick_step = max(1, len(tick_indices) // (num_ticks - 1))
-        tick_indices = tick_indices[::tick_step]
-
-        ax.set_xticks(df["timestamps"].iloc[tick_indices])
-        ax.set_xticklabels(df["timestamps"].iloc[tick_indices], rotation=45)
+        self._set_time_ticks(ax, df["timestamps"])
 
         plt.title(title)
 
@@ -71,31 +91,26 @@ class visualization:
 
         return fig
 
+    @profile.timed("render.bband")
     def bband_visualization(self, df: pd.DataFrame, title: str, ylabel: str, xlabel: str) -> plt.Figure:
 
         fig, ax = plt.subplots(figsize=(12, 8))
 
-        ax.plot(df['timestamps'], df["variables"], color='red', label=ylabel)
-        ax.plot(df['timestamps'], df['sma'], color='blue', label='Middle Band')
-        ax.plot(df['timestamps'], df['upper_band'], color='black', label='Upper Band')
-        ax.plot(df['timestamps'], df['lower_band'], color='black', label='Lower Band')
+        ax.plot(*self.decimate(df['timestamps'], df["variables"]), color='red', label=ylabel)
+        ax.plot(*self.decimate(df['timestamps'], df['sma']), color='blue', label='Middle Band')
+        ax.plot(*self.decimate(df['timestamps'], df['upper_band']), color='black', label='Upper Band')
+        ax.plot(*self.decimate(df['timestamps'], df['lower_band']), color='black', label='Lower Band')
 
         ax2 = ax.twinx()
-        ax2.bar(df['timestamps'], df['prices'], color='r', alpha=0.5, width=0.2)
+        # one bar per bucket at the bucket's highest price instead of one bar per bar
+        bar_timestamps, bar_prices = self.decimate(df['timestamps'], df['prices'], envelope="max")
+        self._bars(ax2, bar_timestamps, bar_prices, color='r', alpha=0.5, width=self._bar_width(bar_timestamps))
         ax2.set_ylabel('Price (USD)', color='r')
         ax2.tick_params('y', colors='r')
         ax2.format_ydata = lambda x: f'${x:.2f}'
         ax2.yaxis.set_major_formatter(FormatStrFormatter('$%.2f'))
 
-        unique_timestamps = df['timestamps'].unique()
-        tick_indices = [i for i, x in enumerate(df['timestamps']) if x in unique_timestamps]
-
-        num_ticks = 5
-        tick_step = max(1, len(tick_indices) // (num_ticks - 1))
-        tick_indices = tick_indices[::tick_step]
-
-        ax.set_xticks(df['timestamps'].iloc[tick_indices])
-        ax.set_xticklabels(df['timestamps'].iloc[tick_indices], rotation=45)
+        self._set_time_ticks(ax, df['timestamps'])
 
         ax.set_xlabel(xlabel)
         ax.set_ylabel(ylabel)
@@ -108,3 +123,84 @@ class visualization:
         #plt.show()
 
         return fig
+
+    def save_heatmaps(self, jobs: List[Dict], n_workers: int = None):
+        # Render and save many heatmap figures in a process pool, off the main process.
+        # A job is {"tables": (sharpe, calmar, n_trade, long_short_duration_ratio), "xticklabels", "yticklabels",
+        # "xlabel", "ylabel", "save_path", "dpi" (optional, 300)}. Worker profiling stages are merged back.
+        jobs = [dict(job, dpi=job.get("dpi", 300), max_points=self.max_points, annotate_max_cells=self.annotate_max_cells) for job in jobs]
+        n_workers = min(n_workers or mp.cpu_count(), len(jobs))
+        if n_workers <= 1:
+            outputs = map(_render_heatmap, jobs)
+            for _, stats in outputs:
+                profile.merge(stats)
+            return
+        with mp.Pool(n_workers) as pool:
+            for _, stats in pool.imap_unordered(_render_heatmap, jobs):
+                profile.merge(stats)
+
+    def tick_labels(self, values: np.ndarray, max_labels: int = 30) -> List[str]:
+        # Heatmap axis labels; on fine grids only every n-th value is labelled so they stay readable
+        every = -(-len(values) // max_labels) # ceil
+        return [f"{value:g}" if i % every == 0 else "" for i, value in enumerate(values)]
+
+    def decimate(self, x, y, envelope: str = "minmax") -> Tuple[np.ndarray, np.ndarray]:
+        # Downsample (x, y) to about max_points points for plotting. The series is cut into equal buckets and
+        # each keeps its lowest and highest point in time order ("minmax"), or only its highest ("max"), so
+        # spikes and drawdown troughs survive. The first and last points are always kept.
+        x = np.asarray(x)
+        y = np.asarray(y, dtype=float)
+        n = len(y)
+        points_per_bucket = 1 if envelope == "max" else 2
+        n_buckets = max(self.max_points // points_per_bucket, 1)
+        if n <= self.max_points or n <= 2:
+            return x, y
+
+        bucket = -(-n // n_buckets) # ceil
+        padded = np.concatenate((y, np.full(-n % bucket, np.nan))).reshape(-1, bucket)
+        offsets = np.arange(len(padded)) * bucket
+        highest = offsets + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+        if envelope == "max":
+            index = highest
+        else:
+            lowest = offsets + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+            index = np.sort(np.concatenate((lowest, highest)))
+        index = np.unique(np.concatenate(([0], np.minimum(index, n - 1), [n - 1])))
+        return x[index], y[index]
+
+    def format_timestamps(self, timestamps: pd.Series) -> np.ndarray:
+        # Epoch milliseconds are turned into readable labels only here, at plot time
+        timestamps = np.asarray(timestamps)
+        if timestamps.dtype.kind in "iuf":
+            return pd.to_datetime(timestamps.astype(np.int64), unit="ms").strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+        return timestamps
+
+    def _set_time_ticks(self, ax: plt.Axes, timestamps: pd.Series, num_ticks: int = 5):
+        # num_ticks evenly spaced ticks labelled with format_timestamps, in O(N)
+        timestamps = np.asarray(timestamps)
+        tick_step = max(1, len(timestamps) // (num_ticks - 1))
+        tick_timestamps = timestamps[::tick_step]
+        ax.set_xticks(tick_timestamps)
+        ax.set_xticklabels(self.format_timestamps(tick_timestamps), rotation=45)
+
+    def _bars(self, ax: plt.Axes, x: np.ndarray, heights: np.ndarray, width: float, **kwargs):
+        # Same picture as ax.bar, drawn as one PolyCollection instead of one Rectangle artist per bar
+        x = np.asarray(x)
+        if x.dtype.kind not in "iuf":
+            ax.bar(x, heights, width=width, **kwargs) # categorical axis
+            return
+        x = x.astype(float)
+        heights = np.asarray(heights, dtype=float)
+        left, right = x - width / 2, x + width / 2
+        zeros = np.zeros_like(heights)
+        vertices = np.stack((np.column_stack((left, zeros)), np.column_stack((left, heights)),
+                             np.column_stack((right, heights)), np.column_stack((right, zeros))), axis=1)
+        ax.add_collection(PolyCollection(vertices, **kwargs), autolim=True)
+        ax.autoscale_view()
+
+    def _bar_width(self, timestamps: pd.Series) -> float:
+        # 0.2 of a bar on a categorical (string) axis, the same fraction of the bar spacing on an epoch axis
+        timestamps = np.asarray(timestamps)
+        if timestamps.dtype.kind in "iuf" and len(timestamps) > 1:
+            return 0.2 * float(np.median(np.diff(timestamps)))
+        return 0.2
@@ -0,0 +1,145 @@
+import numpy as np
+from typing import Dict, List, Tuple
+from functions.evaluation import evaluation
+from functions.strategy import strategies, accounting_engine
+
+st = strategies()
+evaluate = evaluation()
+
+class walk_forward:
+    # Walk-forward optimization: roll (train, test) windows over the series, pick the best grid cell on each
+    # train window by `metric`, and stitch the chosen cells' out-of-sample pnl together.
+    #
+    # Every cell is run once over the full history (rolling statistics only look back, so a bar's position
+    # does not depend on where a fold starts). Fold metrics are then read off prefix sums of pnl, trades and
+    # positions, so overlapping folds share all of the O(N) work; only drawdown-based metrics need a pass
+    # over the train bars of each fold.
+    # With step < test_size a test window ends where the next one starts, so no bar is traded twice; with
+    # step > test_size the bars between test windows are not traded and every window starts flat.
+
+    def __init__(self, train_size: int, test_size: int, step: int = None, metric: str = "sharpe_ratio", maximize: bool = True):
+        self.train_size = int(train_size)
+        self.test_size = int(test_size)
+        self.step = int(step) if step else self.test_size
+        self.metric = metric
+        self.maximize = maximize
+
+    def folds(self, n_bars: int) -> List[Tuple[int, int, int, int]]:
+        # (train_start, train_stop, test_start, test_stop) bar ranges; test windows are clipped to the next
+        # fold's test_start and the last one may be shorter
+        folds = []
+        train_start = 0
+        while train_start + self.train_size < n_bars:
+            test_start = train_start + self.train_size
+            folds.append((train_start, test_start, test_start, min(test_start + self.test_size, test_start + self.step, n_bars)))
+            train_start += self.step
+        if folds:
+            train_start, train_stop, test_start, _ = folds[-1]
+            folds[-1] = (train_start, train_stop, test_start, min(test_start + self.test_size, n_bars))
+        return folds
+
+    def run(self, strategy_name: str, numpy_array: np.ndarray, transaction_cost: float, strategy: int,
+            row_params: np.ndarray, col_params: np.ndarray, interval: str) -> Dict:
+        # strategy_name is any registered strategy, e.g. "bband" (rows: z_threshes, cols: rolling_periods) or
+        # "SMA_cross" (rows: shorter_periods, cols: longer_periods)
+        timestamps = numpy_array[:, 0]
+        prices = numpy_array[:, 1].astype(float)
+        variables = numpy_array[:, 2].astype(float)
+        day_keys = evaluate.bucket_keys(timestamps)
+        pct_changes = accounting_engine.pct_changes(prices)
+        folds = self.folds(len(prices))
+        if not folds:
+            return {"folds": [], "fold_metrics": np.full((0, len(row_params), len(col_params)), np.nan), "chosen_params": [],
+                    "oos_timestamps": timestamps[:0], "oos_pnl": np.array([]), "oos_result": {}}
+
+        fold_metrics = np.full((len(folds), len(row_params), len(col_params)), np.nan)
+        for j, col_param in enumerate(col_params):
+            positions = st.column_positions(strategy_name, variables, strategy, row_params, col_param)
+            _, trades, _, pnl = accounting_engine.ledger(positions, pct_changes, transaction_cost)
+            fold_metrics[:, :, j] = self._fold_metrics(folds, positions, pnl, trades, day_keys)
+
+        # choose a cell per fold; ties and all-NaN folds resolve to the first cell
+        scores = fold_metrics.reshape(len(folds), -1)
+        scores = np.where(np.isnan(scores), -np.inf if self.maximize else np.inf, scores)
+        best = np.argmax(scores, axis=1) if self.maximize else np.argmin(scores, axis=1)
+        chosen = [np.unravel_index(cell, (len(row_params), len(col_params))) for cell in best]
+
+        # stitch out-of-sample pnl; switching cells between folds pays for moving to the new cell's position,
+        # and a window after untraded bars pays for its whole entry
+        cell_pnl = {}
+        oos_pnl, oos_index = [], []
+        previous_position, previous_stop = 0, 0
+        for (_, _, test_start, test_stop), (i, j) in zip(folds, chosen):
+            if test_start != previous_stop:
+                previous_position = 0
+            if (i, j) not in cell_pnl:
+                positions = st.column_positions(strategy_name, variables, strategy, row_params[i:i + 1], col_params[j])
+                _, _, _, pnl = accounting_engine.ledger(positions, pct_changes, transaction_cost)
+                cell_pnl[(i, j)] = (positions[0], pnl[0])
+            positions, pnl = cell_pnl[(i, j)]
+            fold_pnl = pnl[test_start:test_stop].copy()
+            fold_pnl[0] -= abs(positions[test_start - 1] - previous_position) * transaction_cost
+            previous_position, previous_stop = positions[test_stop - 1], test_stop
+            oos_pnl.append(fold_pnl)
+            oos_index.append(np.arange(test_start, test_stop))
+
+        oos_pnl = np.concatenate(oos_pnl)
+        oos_index = np.concatenate(oos_index)
+        return {
+            "folds": folds,
+            "fold_metrics": fold_metrics,
+            "chosen_params": [(row_params[i], col_params[j]) for i, j in chosen],
+            "oos_timestamps": timestamps[oos_index],
+            "oos_pnl": oos_pnl,
+            "oos_result": self._evaluate(oos_pnl, day_keys[oos_index])
+            }
+
+    def _fold_metrics(self, folds: List[Tuple[int, int, int, int]], positions: np.ndarray, pnl: np.ndarray,
+                      trades: np.ndarray, day_keys: np.ndarray) -> np.ndarray:
+        # metric of every row on every train window, from prefix sums shared by all folds
+        zeros = np.zeros((len(pnl), 1))
+        cum_pnl = np.concatenate((zeros, np.cumsum(pnl, axis=1)), axis=1)
+        cum_trades = np.concatenate((zeros, np.cumsum(trades != 0, axis=1)), axis=1)
+        cum_long = np.concatenate((zeros, np.cumsum(positions > 0, axis=1)), axis=1)
+        cum_short = np.concatenate((zeros, np.cumsum(positions < 0, axis=1)), axis=1)
+
+        metrics = np.full((len(folds), len(pnl)), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for f, (train_start, train_stop, _, _) in enumerate(folds):
+                if self.metric == "number_of_trades":
+                    metrics[f] = cum_trades[:, train_stop] - cum_trades[:, train_start]
+                    continue
+                if self.metric == "long_short_duration_ratio":
+                    metrics[f] = (cum_long[:, train_stop] - cum_long[:, train_start]) / (cum_short[:, train_stop] - cum_short[:, train_start])
+                    continue
+
+                # UTC days of the train window, as in strategies
+                edges = np.append(evaluate.segment_starts(day_keys[train_start:train_stop]) + train_start, train_stop)
+                daily_pnl = np.diff(cum_pnl[:, edges], axis=1)
+                if self.metric == "sharpe_ratio":
+                    metrics[f] = (evaluate.day_count ** 0.5) * daily_pnl.mean(axis=1) / daily_pnl.std(axis=1)
+                    continue
+
+                window_cum_pnl = cum_pnl[:, train_start + 1:train_stop + 1]
+                maximum_drawdown = np.min(window_cum_pnl - np.maximum.accumulate(window_cum_pnl, axis=1), axis=1)
+                if self.metric == "maximum_drawdown":
+                    metrics[f] = maximum_drawdown
+                elif self.metric == "calmar_ratio":
+                    cumulative_return = np.prod(1 + daily_pnl, axis=1)
+                    avg_annual_return = cumulative_return ** (1 / (daily_pnl.shape[1] / evaluate.day_count)) - 1
+                    metrics[f] = avg_annual_return / -maximum_drawdown
+                else:
+                    raise ValueError(f"Unknown metric: {self.metric}")
+        return metrics
+
+    def _evaluate(self, pnl: np.ndarray, day_keys: np.ndarray) -> Dict:
+        if len(pnl) == 0:
+            return {}
+        daily_pnl = evaluate.daily_sum(pnl, evaluate.segment_starts(day_keys))
+        maximum_drawdown = evaluate.compute_maximum_drawdown(pnl)
+        return {
+            "sharpe_ratio": evaluate.compute_sharpe_ratio(daily_pnl),
+            "calmar_ratio": evaluate.compute_calmar_ratio(daily_pnl, maximum_drawdown),
+            "maximum_drawdown": maximum_drawdown,
+            "cumulative_pnl": np.sum(pnl)
+            }
@@ -0,0 +1,75 @@
+# Portfolio_backtesting.py
+# Purpose: Back-test a basket of strategies across coins as one portfolio.
+# Every leg is run on its own cleaned dataset, the pnl streams are aligned on a shared timeline and weighted.
+# After execution, the portfolio equity curve and the correlation matrix can be found in /portfolio_results.
+
+import numpy as np
+import matplotlib.pyplot as plt
+import pandas as pd
+import os
+
+from functions.load_data import load_data
+from functions.portfolio import portfolio
+from functions.strategy import strategies
+from functions.visualization import visualization
+
+st = strategies()
+vi = visualization()
+ld = load_data()
+
+data_name = "balance_exchanges"
+interval = "1h"
+transaction_cost = 0.0006
+
+# One leg per (pair, strategy, parameters); weight is used when vol_window is None (and before its first window)
+legs = [
+    {"pair": "BTCUSDT", "strategy_name": "bband", "strategy": -1, "row_param": 1.8, "col_param": 1680, "weight": 0.4},
+    {"pair": "BTCUSDT", "strategy_name": "SMA_cross", "strategy": -1, "row_param": 96, "col_param": 480, "weight": 0.2},
+    {"pair": "ETHUSDT", "strategy_name": "bband", "strategy": -1, "row_param": 1.8, "col_param": 1680, "weight": 0.2},
+    {"pair": "SOLUSDT", "strategy_name": "bband", "strategy": -1, "row_param": 1.8, "col_param": 1680, "weight": 0.2},
+    ]
+vol_window = None # e.g. 24 * 30: weight every leg by 1 / its trailing 30-day volatility instead
+
+folder_path = "portfolio_results"
+
+pf = portfolio(vol_window)
+weights = []
+for leg in legs:
+    csv_path = f"cleaned_data/{leg['pair']}_{data_name}_price_{interval}.csv"
+    if not os.path.exists(csv_path):
+        print(f"{csv_path} not found, leg skipped (run data_preparation.py for {leg['pair']})")
+        continue
+    na = ld.load_array(csv_path)
+    df, _ = st.run(leg["strategy_name"], na[:, [0,1,2]], transaction_cost, leg["strategy"], leg["row_param"], leg["col_param"], interval)
+    pf.add_run(f"{leg['pair']} {leg['strategy_name']} ({leg['row_param']}, {leg['col_param']})", df)
+    weights.append(leg["weight"])
+
+# the weights of the legs that loaded are rescaled to sum to 1
+weights = np.array(weights)
+if len(weights) < len(legs):
+    print(f"{len(legs) - len(weights)} of {len(legs)} legs skipped, weights of the others rescaled from {weights.sum():g} to 1")
+result = pf.run(weights / weights.sum())
+
+# Show the performance
+print("***************************************************************************************")
+print(f"portfolio of {len(pf.names)} legs, {'inverse-volatility' if vol_window else 'fixed'} weights")
+for key, value in result["metrics"].items():
+    print(f"portfolio {key}: {round(value, 4)}")
+print(pd.DataFrame(result["stream_metrics"]).T.round(3))
+print("daily pnl correlation:")
+print(result["correlation"].round(2))
+print("***************************************************************************************")
+
+os.makedirs(folder_path, exist_ok=True)
+result["correlation"].to_csv(os.path.join(folder_path, "correlation.csv"))
+
+# Generate portfolio Equity Curve
+fig, ax = plt.subplots(figsize=(12, 8))
+timestamps, cum_pnl = vi.decimate(result["timestamps"], np.cumsum(result["pnl"]))
+ax.plot(pd.to_datetime(timestamps.astype(np.int64), unit="ms"), cum_pnl, color='red', label="Portfolio Cumulative PnL")
+ax.set_ylabel("Cumulative PNL")
+ax.set_xlabel("Time")
+ax.legend(loc='upper left')
+plt.title(f"Portfolio of {len(pf.names)} legs ({interval} data)")
+fig.savefig(os.path.join(folder_path, "equity_curve.png"), dpi=300)
+print(f"equity curve and correlation.csv can be found in /{folder_path}")
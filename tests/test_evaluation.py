@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+from functions.evaluation import evaluation
+
+evaluate = evaluation()
+
+def bars(interval_ms: int, n: int, drop: float = 0.0, seed: int = 0) -> np.ndarray:
+    # epoch-ms bar open times from 2021-01-01 UTC, a share `drop` of them removed at random
+    timestamps = 1_609_459_200_000 + interval_ms * np.arange(n, dtype=np.int64)
+    keep = np.random.default_rng(seed).random(n) >= drop
+    return timestamps[keep]
+
+def pandas_daily_sum(timestamps: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # reference: pandas resample('1D') over the UTC days that have bars
+    series = pd.Series(values, index=pd.to_datetime(timestamps, unit="ms"))
+    daily = series.resample("1D")
+    return daily.sum()[daily.count() > 0].to_numpy()
+
+@pytest.mark.parametrize("seed", range(5))
+def test_daily_sum_matches_pandas_with_gaps(seed):
+    timestamps = bars(3_600_000, 24 * 60, drop=0.1, seed=seed)
+    # a bar missing exactly at midnight must not move the next bars into the previous day
+    timestamps = timestamps[timestamps % 86_400_000 != 0] if seed == 0 else timestamps
+    values = np.random.default_rng(seed).normal(0, 0.01, len(timestamps))
+    np.testing.assert_allclose(evaluate.daily_sum(values, evaluate.day_starts(timestamps)), pandas_daily_sum(timestamps, values), rtol=1e-12)
+
+@pytest.mark.parametrize("interval_ms, bars_per_day", [(4 * 3_600_000, 6), (86_400_000, 1), (60_000, 1440)])
+def test_daily_sum_matches_pandas_for_intervals(interval_ms, bars_per_day):
+    # 4h and 1d bars were all bucketed as one bar per day by the old interval mapping
+    timestamps = bars(interval_ms, bars_per_day * 30)
+    values = np.random.default_rng(1).normal(0, 0.01, len(timestamps))
+    day_starts = evaluate.day_starts(timestamps)
+    assert len(day_starts) == 30
+    np.testing.assert_array_equal(np.diff(np.append(day_starts, len(timestamps))), bars_per_day)
+    np.testing.assert_allclose(evaluate.daily_sum(values, day_starts), pandas_daily_sum(timestamps, values), rtol=1e-12)
+
+def test_string_and_epoch_timestamps_give_the_same_days():
+    timestamps = bars(3_600_000, 24 * 20, drop=0.2, seed=3)
+    strings = pd.to_datetime(timestamps, unit="ms").strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+    np.testing.assert_array_equal(evaluate.day_starts(strings), evaluate.day_starts(timestamps))
+    np.testing.assert_array_equal(evaluate.day_starts(timestamps.astype(np.float64)), evaluate.day_starts(timestamps))
+
+def test_weeks_start_on_monday():
+    timestamps = bars(86_400_000, 21) # 2021-01-01 was a Friday
+    np.testing.assert_array_equal(evaluate.day_starts(timestamps, "W"), [0, 3, 10, 17])
+
+def metrics_inputs(n_rows: int, n_bars: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    timestamps = bars(3_600_000, n_bars, drop=0.05, seed=seed)
+    positions = rng.choice([-1.0, 0.0, 1.0], (n_rows, len(timestamps)))
+    pct_changes = rng.normal(0, 0.01, len(timestamps))
+    pnl = np.concatenate((np.zeros((n_rows, 1)), positions[:, :-1]), axis=1) * pct_changes - np.abs(np.diff(positions, axis=1, prepend=0)) * 0.0006
+    return pnl, pct_changes, positions, evaluate.day_starts(timestamps)
+
+def test_compute_metrics_batch_matches_rows():
+    pnl, pct_changes, positions, day_starts = metrics_inputs(6, 24 * 90 + 5)
+    batch = evaluate.compute_metrics(pnl, pct_changes, positions, day_starts)
+    for row in range(len(pnl)):
+        single = evaluate.compute_metrics(pnl[row], pct_changes, positions[row], day_starts)
+        for key, value in single.items():
+            assert np.isscalar(value) or np.ndim(value) == 0
+            np.testing.assert_allclose(batch[key][row], value, rtol=1e-12)
+
+def test_compute_metrics_matches_scalar_formulas():
+    pnl, pct_changes, positions, day_starts = metrics_inputs(3, 24 * 60, seed=2)
+    batch = evaluate.compute_metrics(pnl, pct_changes, positions, day_starts)
+    asset_daily_pct_change = evaluate.daily_sum(pct_changes, day_starts)
+    for row in range(len(pnl)):
+        daily_pnl = evaluate.daily_sum(pnl[row], day_starts)
+        maximum_drawdown = evaluate.compute_maximum_drawdown(pnl[row])
+        np.testing.assert_allclose(batch["maximum_drawdown"][row], maximum_drawdown, rtol=1e-12)
+        np.testing.assert_allclose(batch["sharpe_ratio"][row], evaluate.compute_sharpe_ratio(daily_pnl), rtol=1e-12)
+        np.testing.assert_allclose(batch["calmar_ratio"][row], evaluate.compute_calmar_ratio(daily_pnl, maximum_drawdown), rtol=1e-12)
+        np.testing.assert_allclose(batch["beta"][row], evaluate.compute_beta(daily_pnl, asset_daily_pct_change), rtol=1e-12)
+
+def test_beta_uses_one_ddof():
+    # a strategy that is exactly k times the asset has beta k
+    asset = np.random.default_rng(4).normal(0, 0.02, 50)
+    assert evaluate.compute_beta(1.5 * asset, asset) == pytest.approx(1.5, rel=1e-12)
+    np.testing.assert_allclose(evaluate.compute_betas(np.vstack((1.5 * asset, -asset)), asset[None, :]), [1.5, -1.0], rtol=1e-12)
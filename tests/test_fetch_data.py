@@ -0,0 +1,160 @@
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pytest
+import functions.fetch_data as fetch_module
+from functions.fetch_data import fetch_data
+
+HOUR = 3_600_000
+
+class mock_binance:
+    # Local stand-in for the Binance klines endpoint: hourly klines of the requested window, answered after a
+    # random delay so pages complete out of order. failures maps (symbol, startTime) to the status codes
+    # returned before that page succeeds (429 and 418 carry Retry-After).
+
+    def __init__(self, failures: dict = None, retry_after: float = 0.05):
+        self.failures = {key: list(codes) for key, codes in (failures or {}).items()}
+        self.retry_after = retry_after
+        self.requests = []
+        self.lock = threading.Lock()
+        mock = self
+
+        class handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                key = (query["symbol"], int(query["startTime"]))
+                with mock.lock:
+                    mock.requests.append((key, time.monotonic()))
+                    codes = mock.failures.get(key)
+                    status = codes.pop(0) if codes else 200
+                time.sleep(random.random() * 0.01)
+                if status != 200:
+                    self.send_response(status)
+                    if status in (418, 429):
+                        self.send_header("Retry-After", str(mock.retry_after))
+                    self.end_headers()
+                    return
+                start, end = int(query["startTime"]), int(query["endTime"])
+                rows = [[t, "1", "2", "0.5", "1.5", "10", t + HOUR - 1, "15", 3, "4", "6", "0"]
+                        for t in range(-(-start // HOUR) * HOUR, end + 1, HOUR)]
+                body = json.dumps(rows).encode()
+                self.send_response(200)
+                self.send_header("X-MBX-USED-WEIGHT-1M", "5")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/fapi/v1/klines"
+
+    def count(self, key) -> int:
+        return sum(1 for request_key, _ in self.requests if request_key == key)
+
+    def times(self, key) -> list:
+        return [at for request_key, at in self.requests if request_key == key]
+
+def client(mock: mock_binance) -> fetch_data:
+    fd = fetch_data()
+    fd.binance_klines_url = mock.url
+    fd.backoff_seconds = 0.01
+    return fd
+
+START = datetime(2021, 1, 1, tzinfo=timezone.utc)
+END = datetime(2021, 6, 1, tzinfo=timezone.utc)
+
+def expected_open_times() -> np.ndarray:
+    start, end = int(START.timestamp() * 1000), int(END.timestamp() * 1000)
+    windows = fetch_data()._kline_windows("1h", START, END)
+    return np.arange(start, windows[-1][1] + 1, HOUR)
+
+def test_pages_are_assembled_in_order():
+    mock = mock_binance()
+    try:
+        dfs = client(mock).get_prices(["BTCUSDT", "ETHUSDT"], "", "1h", START, END, epoch_ms=True)
+    finally:
+        mock.server.shutdown()
+    assert len(fetch_data()._kline_windows("1h", START, END)) > 1
+    for symbol, df in dfs.items():
+        np.testing.assert_array_equal(df["open time"].to_numpy(), expected_open_times())
+        assert df["open time"].dtype == np.int64 and df["close time"].dtype == np.int64
+
+def test_rate_limit_waits_for_retry_after():
+    first_page = ("BTCUSDT", int(START.timestamp() * 1000))
+    mock = mock_binance({first_page: [429, 418]}, retry_after=0.2)
+    try:
+        df = client(mock).get_price("BTCUSDT", "", "1h", START, END, epoch_ms=True)
+    finally:
+        mock.server.shutdown()
+    assert mock.count(first_page) == 3
+    assert np.all(np.diff(mock.times(first_page)) >= 0.2)
+    np.testing.assert_array_equal(df["open time"].to_numpy(), expected_open_times())
+
+def test_server_errors_back_off_and_retry():
+    second_page = ("BTCUSDT", fetch_data()._kline_windows("1h", START, END)[1][0])
+    mock = mock_binance({second_page: [500, 503]})
+    try:
+        df = client(mock).get_price("BTCUSDT", "", "1h", START, END, epoch_ms=True)
+    finally:
+        mock.server.shutdown()
+    assert mock.count(second_page) == 3
+    np.testing.assert_array_equal(df["open time"].to_numpy(), expected_open_times())
+
+def test_gives_up_after_max_retries():
+    first_page = ("BTCUSDT", int(START.timestamp() * 1000))
+    mock = mock_binance({first_page: [503] * 10})
+    fd = client(mock)
+    fd.max_retries = 3
+    try:
+        with pytest.raises(RuntimeError):
+            fd.get_price("BTCUSDT", "", "1h", START, END, epoch_ms=True)
+    finally:
+        mock.server.shutdown()
+    assert mock.count(first_page) == 3
+
+class fake_clock:
+    # Stands in for the time module of fetch_data: sleeping advances the clock instead of waiting
+    def __init__(self, now: float):
+        self.now = now
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def test_weight_budget_waits_for_the_next_minute(monkeypatch):
+    clock = fake_clock(60 * 1000 + 15)
+    monkeypatch.setattr(fetch_module, "time", clock)
+    fd = fetch_data()
+    fd.binance_weight_limit = 12
+    for _ in range(2):
+        fd._acquire_binance_weight(5)
+    assert clock.sleeps == []
+    fd._acquire_binance_weight(5) # 15 > 12: wait out the remaining 45 s of the minute
+    assert clock.sleeps == [pytest.approx(45)]
+    assert fd._weight_used == 5
+
+def test_reported_weight_raises_the_budget_used(monkeypatch):
+    clock = fake_clock(60 * 1000 + 15)
+    monkeypatch.setattr(fetch_module, "time", clock)
+    fd = fetch_data()
+    fd.binance_weight_limit = 100
+    fd._acquire_binance_weight(5)
+
+    class response:
+        headers = {"X-MBX-USED-WEIGHT-1M": "98"} # other processes of this IP used most of the minute
+    fd._update_binance_weight(response)
+    assert fd._weight_used == 98
+    fd._acquire_binance_weight(5)
+    assert clock.sleeps == [pytest.approx(45)]
@@ -0,0 +1,127 @@
+from datetime import datetime, timezone
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from functions.load_data import load_data
+
+ld = load_data()
+
+HOUR = 3_600_000
+START = 1_609_459_200_000 # 2021-01-01 00:00:00 UTC
+
+def frame(first: int, n: int) -> pd.DataFrame:
+    # rows of hourly bars starting at bar `first`, with an extra column and not in the stored column order
+    # (stored files keep their time column first)
+    times = START + HOUR * np.arange(first, first + n)
+    return pd.DataFrame({"price": 100.0 + np.arange(first, first + n), "time": times, "extra": 1})
+
+def write(path, header: str, rows: list):
+    path.write_text("\n".join([header] + rows) + "\n")
+
+def test_missing_and_header_only_files(tmp_path):
+    default = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    missing, empty = tmp_path / "missing.csv", tmp_path / "empty.csv"
+    write(empty, "time,price", [])
+    assert ld.last_timestamp(str(missing)) is None
+    assert ld.last_timestamp(str(empty)) is None
+    assert ld.resume_time([str(missing)], default) == default
+    assert ld.resume_time([str(empty)], default) == default
+
+def test_epoch_file(tmp_path):
+    path = tmp_path / "epoch.csv"
+    write(path, "time,price", [f"{START + HOUR * i},{100.0 + i}" for i in range(3)])
+    assert ld.last_timestamp(str(path)) == START + 2 * HOUR
+    assert ld.resume_time([str(path)], None) == datetime.fromtimestamp((START + 2 * HOUR) / 1000, tz=timezone.utc)
+
+    # bars 1..4 overlap the stored 0..2: only 3 and 4 are appended, in the stored column order and format
+    assert ld.append_csv(str(path), frame(1, 4), ["time"]) == 2
+    df = pd.read_csv(path)
+    assert list(df.columns) == ["time", "price"]
+    np.testing.assert_array_equal(df["time"], START + HOUR * np.arange(5))
+    np.testing.assert_array_equal(df["price"], 100.0 + np.arange(5))
+
+def test_string_file(tmp_path):
+    path = tmp_path / "string.csv"
+    write(path, "time,price", ["2021-01-01 00:00:00,100.0", "2021-01-01 01:00:00,101.0"])
+    assert ld.last_timestamp(str(path)) == START + HOUR
+
+    assert ld.append_csv(str(path), frame(0, 4), ["time"]) == 2
+    df = pd.read_csv(path)
+    assert list(df.columns) == ["time", "price"]
+    assert list(df["time"]) == ["2021-01-01 00:00:00", "2021-01-01 01:00:00", "2021-01-01 02:00:00", "2021-01-01 03:00:00"]
+    np.testing.assert_array_equal(df["price"], [100.0, 101.0, 102.0, 103.0])
+
+def test_append_creates_missing_and_header_only_files(tmp_path):
+    missing, empty = tmp_path / "missing.csv", tmp_path / "empty.csv"
+    empty.write_text("")
+    for path in (missing, empty):
+        assert ld.append_csv(str(path), frame(0, 3), ["time"]) == 3
+        assert list(pd.read_csv(path).columns) == ["price", "time", "extra"]
+
+def test_resume_time_is_the_earliest_last_row(tmp_path):
+    early, late = tmp_path / "early.csv", tmp_path / "late.csv"
+    write(early, "time,price", [f"{START},100.0"])
+    write(late, "time,price", [f"{START},100.0", "2021-01-01 05:00:00,105.0"])
+    assert ld.last_timestamp(str(late)) == START + 5 * HOUR
+    assert ld.resume_time([str(early), str(late)], None) == datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+def test_nothing_new_appends_nothing(tmp_path):
+    path = tmp_path / "epoch.csv"
+    write(path, "time,price", [f"{START + HOUR * i},{100.0 + i}" for i in range(3)])
+    before = path.read_text()
+    assert ld.append_csv(str(path), frame(0, 3), ["time"]) == 0
+    assert path.read_text() == before
+
+def write_cleaned(path, n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({"time": START + HOUR * np.arange(n), "price": 100 + rng.random(n), "balance": rng.random(n)}).to_csv(path, index=False)
+
+def test_cache_is_read_only_and_matches_the_csv(tmp_path):
+    csv_path = tmp_path / "cleaned.csv"
+    write_cleaned(csv_path, 50)
+    cached = load_data(str(tmp_path / "cache"))
+    numpy_array = cached.load_array(str(csv_path))
+    assert isinstance(numpy_array, np.memmap) and not numpy_array.flags.writeable
+    with pytest.raises(ValueError):
+        numpy_array[0, 1] = 0
+    np.testing.assert_array_equal(numpy_array, pd.read_csv(csv_path).to_numpy(dtype=np.float64))
+    timestamps, values, columns = cached.load_cleaned(str(csv_path))
+    assert timestamps.dtype == np.int64 and columns == ["time", "price", "balance"]
+    np.testing.assert_array_equal(values, numpy_array[:, 1:])
+
+def test_cache_is_rebuilt_when_the_csv_changes(tmp_path):
+    csv_path = tmp_path / "cleaned.csv"
+    cached = load_data(str(tmp_path / "cache"))
+    write_cleaned(csv_path, 50)
+    first = np.array(cached.load_array(str(csv_path)))
+
+    # unchanged csv: the cache file is reused
+    mtime = os.stat(tmp_path / "cache" / "cleaned.npy").st_mtime_ns
+    cached.load_array(str(csv_path))
+    assert os.stat(tmp_path / "cache" / "cleaned.npy").st_mtime_ns == mtime
+
+    # other size
+    write_cleaned(csv_path, 60)
+    assert len(cached.load_array(str(csv_path))) == 60
+
+    # same size, other content and modification time
+    write_cleaned(csv_path, 50)
+    cached.load_array(str(csv_path))
+    text = csv_path.read_text()
+    size, stat = len(text), os.stat(csv_path)
+    csv_path.write_text(text[:-2] + ("1" if text[-2] != "1" else "2") + text[-1])
+    assert os.path.getsize(csv_path) == size
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = cached.load_array(str(csv_path))
+    assert not np.array_equal(second, first)
+    np.testing.assert_array_equal(second, pd.read_csv(csv_path).to_numpy(dtype=np.float64))
+
+def test_rebuild_removes_the_old_two_file_cache(tmp_path):
+    csv_path = tmp_path / "cleaned.csv"
+    write_cleaned(csv_path, 10)
+    (tmp_path / "cache").mkdir()
+    for suffix in (".time.npy", ".values.npy", ".json"):
+        (tmp_path / "cache" / f"cleaned{suffix}").write_text("{}")
+    load_data(str(tmp_path / "cache")).load_array(str(csv_path))
+    assert sorted(os.listdir(tmp_path / "cache")) == ["cleaned.json", "cleaned.npy"]
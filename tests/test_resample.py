@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from functions.resample import interval_ms, resampler
+
+START = 1_609_459_200_000 + 7 * 60_000 # 2021-01-01 00:07 UTC, so the first 5m..1d bars are partial
+
+def write_base(path, n: int, drop: float, seed: int = 0) -> pd.DataFrame:
+    # 1m cleaned CSV: time, price (open), the on-chain variable and volume, a share `drop` of the bars missing
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "time": START + 60_000 * np.arange(n, dtype=np.int64),
+        "price": 30_000 * np.exp(np.cumsum(rng.normal(0, 0.001, n))),
+        "balance_exchanges": 2e6 + np.cumsum(rng.normal(0, 10, n)),
+        "volume": rng.random(n) * 100,
+        })
+    df = df[rng.random(n) >= drop]
+    df.to_csv(path, index=False)
+    return df
+
+def pandas_resample(df: pd.DataFrame, interval: str, variable_how: str) -> pd.DataFrame:
+    # reference: pandas resample of every column by its rule, keeping only the bars that have all their base bars
+    bars = df.set_index(pd.to_datetime(df["time"], unit="ms")).drop(columns="time")
+    rule = f"{interval_ms[interval] // 60_000}min"
+    resampled = bars.resample(rule).agg({"price": "first", "balance_exchanges": variable_how, "volume": "sum"})
+    complete = bars["price"].resample(rule).count() == interval_ms[interval] // 60_000
+    resampled = resampled[complete]
+    return pd.DataFrame(dict({"time": resampled.index.as_unit("ms").asi8}, **resampled))
+
+@pytest.mark.parametrize("drop", [0.0, 0.05])
+@pytest.mark.parametrize("variable_how", ["last", "mean"])
+def test_matches_pandas_resample(tmp_path, drop, variable_how):
+    base_csv = tmp_path / "BTCUSDT_balance_exchanges_price_1m.csv"
+    df = write_base(base_csv, 3 * 24 * 60, drop)
+    rs = resampler(str(tmp_path / "cache"), variable_how)
+    intervals = ["5m", "15m", "1h", "4h"]
+    built = rs.build(str(base_csv), "1m", intervals)
+    for interval in intervals:
+        expected = pandas_resample(df, interval, variable_how)
+        timestamps, values = built[interval]
+        np.testing.assert_array_equal(timestamps, expected["time"])
+        np.testing.assert_allclose(values, expected[["price", "balance_exchanges", "volume"]].to_numpy(), rtol=1e-12)
+
+        numpy_array = rs.load_array(str(base_csv), "1m", interval)
+        assert isinstance(numpy_array, np.memmap) and not numpy_array.flags.writeable
+        np.testing.assert_array_equal(numpy_array[:, 0], timestamps)
+        np.testing.assert_array_equal(numpy_array[:, 1:], values)
+
+def test_gaps_drop_the_partial_bars(tmp_path):
+    base_csv = tmp_path / "base_1m.csv"
+    df = write_base(base_csv, 24 * 60, 0.05, seed=3)
+    timestamps, _ = resampler(str(tmp_path / "cache")).build(str(base_csv), "1m", ["5m"])["5m"]
+    # every kept bar opens on a base bar, i.e. its first price is the price at its open time
+    assert np.isin(timestamps, df["time"]).all()
+    counts = pd.Series(1, index=pd.to_datetime(df["time"], unit="ms")).resample("5min").count()
+    assert len(timestamps) == np.sum(counts == 5)
+
+def test_cache_follows_the_base_csv(tmp_path):
+    base_csv = tmp_path / "base_1m.csv"
+    write_base(base_csv, 24 * 60, 0.0)
+    rs = resampler(str(tmp_path / "cache"))
+    before = np.array(rs.load_array(str(base_csv), "1m", "1h"))
+    write_base(base_csv, 2 * 24 * 60, 0.0, seed=1)
+    after = rs.load_array(str(base_csv), "1m", "1h")
+    assert len(after) > len(before)
+
+def test_rejects_intervals_that_do_not_divide(tmp_path):
+    base_csv = tmp_path / "base_1h.csv"
+    write_base(base_csv, 100, 0.0)
+    with pytest.raises(ValueError):
+        resampler(str(tmp_path / "cache")).build(str(base_csv), "3m", ["5m"])
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from functions.live import bband_stream, SMA_cross_stream
+from functions.strategy import strategies
+
+st = strategies()
+
+def loop_hysteresis(z_scores: np.ndarray, z_thresh: float, strategy: int) -> np.ndarray:
+    # The original per-bar state machine of strategies.bband, kept as the reference of bband_signal.hysteresis
+    position = 0
+    positions = np.zeros_like(z_scores)
+    for y, z in enumerate(z_scores):
+        if z >= z_thresh:
+            positions[y] = strategy
+            position = strategy
+        elif z <= -z_thresh:
+            positions[y] = -strategy
+            position = -strategy
+        elif z > 0 and position == strategy:
+            positions[y] = position
+        elif z < 0 and position == -strategy:
+            positions[y] = position
+        else:
+            positions[y] = 0
+            position = 0
+    return positions
+
+def random_z_scores(rng: np.random.Generator, n: int) -> np.ndarray:
+    # z-scores with the edge cases of real data sprinkled in: NaN (warm-up, zero std), +-inf and exact zeros
+    z_scores = rng.normal(0, 1.5, n)
+    special = rng.random(n)
+    z_scores[special < 0.03] = np.nan
+    z_scores[(special >= 0.03) & (special < 0.05)] = np.inf
+    z_scores[(special >= 0.05) & (special < 0.07)] = -np.inf
+    z_scores[(special >= 0.07) & (special < 0.10)] = 0.0
+    return z_scores
+
+def history(n: int, seed: int = 0) -> np.ndarray:
+    # (timestamps, prices, variables) of n hourly bars, with a flat stretch of the variable (zero std) and gaps
+    rng = np.random.default_rng(seed)
+    timestamps = 1_600_000_000_000 + 3_600_000 * np.arange(n, dtype=np.float64)
+    prices = 10_000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    variables = 1e6 + np.cumsum(rng.normal(0, 100, n))
+    variables[n // 3:n // 3 + 200] = variables[n // 3]
+    variables[rng.random(n) < 0.002] = np.nan
+    return np.column_stack((timestamps, prices, variables))
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("z_thresh", [0.0, 0.5, 1.8, 3.0, -0.5])
+@pytest.mark.parametrize("strategy", [1, -1])
+def test_hysteresis_matches_loop(seed, z_thresh, strategy):
+    z_scores = random_z_scores(np.random.default_rng(seed), 2000)
+    expected = loop_hysteresis(z_scores, z_thresh, strategy)
+    np.testing.assert_array_equal(st.signal("bband").hysteresis(z_scores, z_thresh, strategy), expected)
+
+def test_hysteresis_empty():
+    assert len(st.signal("bband").hysteresis(np.array([]), 1.0, 1)) == 0
+
+def replay(stream, numpy_array: np.ndarray):
+    updates = stream.update_batch([tuple(bar) for bar in numpy_array])
+    return np.array([update["position"] for update in updates]), np.array([update["pnl"] for update in updates])
+
+@pytest.mark.parametrize("z_thresh, rolling_period", [(0.0, 24), (1.0, 96), (1.8, 720)])
+@pytest.mark.parametrize("strategy", [1, -1])
+def test_bband_stream_replays_history(z_thresh, rolling_period, strategy):
+    numpy_array = history(8000)
+    df, _ = st.bband(numpy_array, 0.0006, strategy, z_thresh, rolling_period, "1h")
+    positions, pnl = replay(bband_stream(0.0006, strategy, z_thresh, rolling_period), numpy_array)
+    np.testing.assert_array_equal(positions, df["positions"].to_numpy())
+    np.testing.assert_array_equal(pnl, df["pnl"].to_numpy())
+
+@pytest.mark.parametrize("shorter_period, longer_period", [(24, 96), (96, 480)])
+@pytest.mark.parametrize("strategy", [1, -1])
+def test_SMA_cross_stream_replays_history(shorter_period, longer_period, strategy):
+    numpy_array = history(8000, seed=1)
+    df, _ = st.SMA_cross(numpy_array, 0.0006, strategy, shorter_period, longer_period, "1h")
+    positions, pnl = replay(SMA_cross_stream(0.0006, strategy, shorter_period, longer_period), numpy_array)
+    np.testing.assert_array_equal(positions, df["positions"].to_numpy())
+    np.testing.assert_array_equal(pnl, df["pnl"].to_numpy())
+
+@pytest.mark.parametrize("strategy_name, row_param, col_param", [("bband", 1.0, 96), ("SMA_cross", 24, 96)])
+@pytest.mark.parametrize("extra_bars", [0, 7]) # whole days after the warm-up, then a partial last day
+def test_run_at_day_boundaries(strategy_name, row_param, col_param, extra_bars):
+    numpy_array = history(col_param - 1 + 24 * 40 + extra_bars)
+    df, result = st.run(strategy_name, numpy_array, 0.0006, 1, row_param, col_param, "1h")
+    assert len(df) == 24 * 40 + extra_bars
+    assert np.isfinite(result["beta"])
+    assert np.isfinite(result["sharpe_ratio"]) and np.isfinite(result["calmar_ratio"])
+
+GRIDS = [("bband", np.array([0.0, 0.8, 1.8, 3.0]), np.array([24, 96, 720, 9000])),
+         ("SMA_cross", np.array([12, 24, 96]), np.array([48, 240, 9000]))]
+
+@pytest.mark.parametrize("strategy_name, row_params, col_params", GRIDS)
+@pytest.mark.parametrize("strategy", [1, -1])
+def test_grid_matches_run(strategy_name, row_params, col_params, strategy):
+    # the last column's window is longer than the 5000 bars and stays NaN
+    numpy_array = history(5000, seed=2)
+    tables = st.grid(strategy_name, numpy_array, 0.0006, strategy, row_params, col_params, "1h")
+    for j, col_param in enumerate(col_params):
+        for i, row_param in enumerate(row_params):
+            if col_param >= len(numpy_array):
+                assert all(np.isnan(values[i, j]) for values in tables.values())
+                continue
+            _, result = st.run(strategy_name, numpy_array, 0.0006, strategy, row_param, col_param, "1h", metrics_only=True)
+            for key, values in tables.items():
+                np.testing.assert_allclose(values[i, j], result[key], rtol=1e-10, atol=1e-12, err_msg=f"{key} of ({row_param}, {col_param})")
+
+@pytest.mark.parametrize("strategy_name, row_params, col_params", GRIDS)
+def test_cost_grid_matches_grid_per_fee(strategy_name, row_params, col_params):
+    numpy_array = history(5000, seed=3)
+    transaction_costs = np.array([0.0, 0.0004, 0.002])
+    tables = st.cost_grid(strategy_name, numpy_array, transaction_costs, -1, row_params, col_params, "1h")
+    for k, transaction_cost in enumerate(transaction_costs):
+        expected = st.grid(strategy_name, numpy_array, transaction_cost, -1, row_params, col_params, "1h")
+        for key, values in expected.items():
+            np.testing.assert_allclose(tables[key][k], values, rtol=1e-10, atol=1e-12, err_msg=f"{key} at fee {transaction_cost}")
+    assert np.isnan(tables["sharpe_ratio"][:, :, -1]).all()
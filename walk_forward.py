@@ -0,0 +1,62 @@
+# Walk_forward.py
+# Purpose: Walk-forward optimization of a trading strategy.
+# The best parameters are re-chosen on every rolling train window and applied to the following test window.
+# After execution, the stitched out-of-sample equity curve can be found in /equity_curves folder.
+
+import numpy as np
+import matplotlib.pyplot as plt
+import pandas as pd
+import os
+
+from functions.load_data import load_data
+from functions.visualization import visualization
+from functions.walk_forward import walk_forward
+
+ld = load_data()
+vi = visualization()
+
+# Prepare dataset
+coin = "BTC"
+pair = f"{coin}USDT"
+endpoint = "https://api.glassnode.com/v1/metrics/distribution/balance_exchanges"
+data_name = endpoint.split('/')[-1]
+interval = "1h"
+
+strategy_name = "bband"
+transaction_cost = 0.0006
+strategy = -1
+
+z_threshes = np.array([0.0, 0.2, 0.4, 0.6, 0.8, 1.0, 1.2, 1.4, 1.6, 1.8, 2.0, 2.2, 2.4, 2.6, 2.8, 3.0])
+rolling_periods = np.array([24, 48, 96, 144, 192, 240, 360, 480, 600, 720, 840, 960, 1200, 1440, 1680, 1920, 2160, 2400])
+
+# Walk-forward settings (in bars)
+train_size = 24 * 180 # choose parameters on the last 180 days
+test_size = 24 * 30 # trade them for the next 30 days
+metric = "sharpe_ratio" # sharpe_ratio, calmar_ratio, maximum_drawdown, number_of_trades or long_short_duration_ratio
+
+na = ld.load_array(f"cleaned_data/{pair}_{data_name}_price_{interval}.csv")
+wf = walk_forward(train_size, test_size, metric=metric)
+result = wf.run(strategy_name, na[:, [0,1,2]], transaction_cost, strategy, z_threshes, rolling_periods, interval)
+
+# Show the performance
+print("***************************************************************************************")
+print(f"walk-forward {strategy_name} on {data_name}: {len(result['folds'])} folds, chosen by {metric}")
+for (_, _, test_start, test_stop), (z_thresh, rolling_period) in zip(result["folds"], result["chosen_params"]):
+    print(f"bars {test_start}-{test_stop}: z_thresh = {round(z_thresh, 2)}, rolling_period = {rolling_period}")
+for key, value in result["oos_result"].items():
+    print(f"out-of-sample {key}: {round(value, 4)}")
+print("***************************************************************************************")
+
+# Generate out-of-sample Equity Curve
+fig, ax = plt.subplots(figsize=(12, 8))
+oos_timestamps, oos_cum_pnl = vi.decimate(result["oos_timestamps"], np.cumsum(result["oos_pnl"]))
+ax.plot(pd.to_datetime(oos_timestamps.astype(np.int64), unit="ms"), oos_cum_pnl, color='red', label="Walk-forward Cumulative PnL")
+ax.set_ylabel("Cumulative PNL")
+ax.set_xlabel("Time")
+ax.legend(loc='upper left')
+plt.title(f"{pair} {data_name} {strategy_name} walk-forward ({interval} data, train {train_size} bars, test {test_size} bars)")
+
+folder_path = "equity_curves"
+save_path = os.path.join(folder_path, "walk_forward.png")
+fig.savefig(save_path, dpi=300)
+print(f"Equity Curve can be found in /{folder_path}")